@@ -1,18 +1,31 @@
-import yaml
 import streamlit as st
 import pandas as pd
 import csv
-import re
+import collections
 import extra_streamlit_components as stx
-from rapidfuzz import process, fuzz
-
-def load_config(file_path="use_cases.yaml"):
-    with open(file_path, "r") as file:
-        return yaml.safe_load(file)
-
-def save_config(data, file_path="use_cases.yaml"):
-    with open(file_path, "w") as file:
-        yaml.safe_dump(data, file, allow_unicode=True)
+from config_store import load_config, update_config
+from datafiles import UPLOAD_TYPES
+from rules import rule_problems
+from upload_cache import read_upload, upload_columns, upload_fingerprint, upload_info, upload_uniques
+from clustering import cluster_mergers, cluster_words, normalize_word
+from matching import DEFAULT_SCORER, DEFAULT_SEPARATORS, SCORERS
+from normalization import normalization_options
+
+# Oznake možnosti normalizacije (normalization.DEFAULT_OPTIONS)
+NORMALIZATION_LABELS = {
+    "nfkc": "Poenoti zapis znakov (NFKC)",
+    "casefold": "Ne razlikuj velikih in malih črk",
+    "strip_diacritics": "Odstrani naglase in šumnike (č → c)",
+    "collapse_whitespace": "Združi zaporedne presledke",
+    "strip_punctuation": "Odstrani ločila",
+}
+
+def save_use_case(name, use_case):
+    """Shrani en use case; ostali ostanejo, kot so v datoteki (tudi spremembe iz drugih sej)."""
+    update_config(lambda config: config["use_cases"].update({name: use_case}))
+
+def delete_use_case(name):
+    update_config(lambda config: config["use_cases"].pop(name, None))
 
 def validate_words(input_string):
     """Preveri, da je vnos seznam besed, ločenih z vejicami, ki dovoljuje posebne znake in številke."""
@@ -22,6 +35,23 @@ def validate_words(input_string):
     else:
         return None        
 
+# Največ toliko shranjenih štetij in skupin besed (za različne datoteke, stolpce in sezname besed)
+CLUSTER_ENTRIES = 32
+
+@st.cache_data(max_entries=CLUSTER_ENTRIES, show_spinner=False)
+def word_counts(fingerprint, columns, _df):
+    """Število vrstic za vsako normalizirano besedo v stolpcih columns (tuple) naložene datoteke."""
+    counts = collections.Counter()
+    for col in columns:
+        for word, count in _df[col].dropna().astype(str).value_counts().items():
+            counts[normalize_word(word)] += count
+    return counts
+
+@st.cache_data(max_entries=CLUSTER_ENTRIES, show_spinner=False)
+def word_clusters(fingerprint, columns, words, _counts):
+    """Skupine podobnih besed words (tuple); izračunajo se enkrat za datoteko, stolpce in seznam besed."""
+    return cluster_words(list(words), _counts)
+
 config = load_config()
 
 
@@ -121,23 +151,50 @@ if selected_tab == "tab1":
             "Predvidena polja (ločene z vejico):", 
             current_config["columns"]
         )
+
+        # partial_ratio in token_set_ratio sta primerna za odgovore z več besedami (npr. "hot hofer")
+        updated_scorer = st.selectbox(
+            "Ocenjevalnik podobnosti:",
+            list(SCORERS),
+            index=list(SCORERS).index(current_config.get("scorer", DEFAULT_SCORER)),
+        )
+
+        # Ločila so ločena z |, da so lahko med njimi tudi vejice in presledki (npr. " in ")
+        updated_separators = st.text_input(
+            "Ločila za več odgovorov v eni celici (ločena z |, prazno izklopi):",
+            "|".join(current_config.get("separators", DEFAULT_SEPARATORS)),
+        )
+
+        st.write("Normalizacija vrednosti pred primerjanjem:")
+        updated_normalization = {
+            name: st.checkbox(NORMALIZATION_LABELS[name], value=enabled)
+            for name, enabled in normalization_options(current_config.get("normalization"))
+        }
      
         
         # Save Changes
         if st.button("Shrani spremembe"):
-            try:
-                # Update the configuration with user inputs
-                current_config["mergers"] = dict(updated_mergers.values)
-                current_config["renamers"] = dict(updated_renamers.values)
-                current_config["identificators"] = dict(updated_identificators.values)
-                current_config["columns"] = updated_columns
-                current_config["recomenders"] = updated_recomenders
-
-                # Save to file
-                save_config(config)
-                st.success("Konfiguracija shranjena!")
-            except Exception as e:
-                st.error(f"Napaka pri shranjevanju konfiguracije: {e}")
+            # Pravila s konflikti ali cikli se ne shranijo
+            problems = rule_problems(dict(updated_mergers.values), dict(updated_renamers.values), updated_normalization)
+            for problem in problems:
+                st.error(problem)
+            if not problems:
+                try:
+                    # Update the configuration with user inputs
+                    current_config["mergers"] = dict(updated_mergers.values)
+                    current_config["renamers"] = dict(updated_renamers.values)
+                    current_config["identificators"] = dict(updated_identificators.values)
+                    current_config["columns"] = updated_columns
+                    current_config["recomenders"] = updated_recomenders
+                    current_config["scorer"] = updated_scorer
+                    current_config["separators"] = [separator for separator in updated_separators.split("|") if separator]
+                    current_config["normalization"] = updated_normalization
+
+                    # Save to file
+                    save_use_case(use_case, current_config)
+                    st.success("Konfiguracija shranjena!")
+                except Exception as e:
+                    st.error(f"Napaka pri shranjevanju konfiguracije: {e}")
 
 if selected_tab == "tab2":
     st.title("Dodaj use case")                
@@ -145,9 +202,9 @@ if selected_tab == "tab2":
     # Input for new use case name
     new_use_case_name = st.text_input("Ime novega use case-a")
 
-    st.write("Naloži CSV datoteko in izberi stolpce.")
+    st.write("Naloži datoteko (CSV, Parquet, Feather, SPSS ali Stata) in izberi stolpce.")
     # File uploader
-    uploaded_file = st.file_uploader("Naloži CSV", type="csv")
+    uploaded_file = st.file_uploader("Naloži datoteko", type=UPLOAD_TYPES)
 
     recognised_column_names = []
     processed_dfs = []
@@ -157,38 +214,37 @@ if selected_tab == "tab2":
         
         have_delimiter = False
         try:
-            uploaded_file.seek(0)  
-            sample = uploaded_file.read(1024).decode('utf-8')  
-            uploaded_file.seek(0)  
-            detected_delimiter = csv.Sniffer().sniff(sample).delimiter 
-            have_delimiter = True
-        except csv.Error:
-            detected_delimiter = ';'
+            # Oblika, ločilo in stolpci se določijo enkrat za vsebino datoteke
+            fingerprint = upload_fingerprint(uploaded_file)
+            upload = upload_info(fingerprint, uploaded_file, uploaded_file.name)
             have_delimiter = True
         except Exception as e:
             st.error(f"Prišlo je do napake pri branju datoteke: {e}")    
         if have_delimiter == True:      
             try:
 
-                df = pd.read_csv(uploaded_file, delimiter=detected_delimiter)
+                df_columns = upload["columns"]
                 unique_words_set = set() 
 
                 # Input for column name
                 selected_columns = st.multiselect(
                     "Izberite stolpce, ki bodo pred izbrani:",
-                    options=df.columns.tolist(),
+                    options=df_columns,
                 )
                 if len(selected_columns) > 0:
                     columns = ','.join(selected_columns)
                     column_names = [col.strip() for col in columns.split(',')]
+                    # Preberejo se samo izbrani stolpci, enkrat za vsako izbiro
+                    df = read_upload(uploaded_file, upload, column_names)
                     for col in column_names:
                         if col in df.columns:
                             recognised_column_names.append(col)
-                            unique_words = df[col].dropna().unique()
-                            # Strip words, filter out empty stfrings, and add unique words to the set
-                            unique_words_set.update([str(word).strip() for word in unique_words if str(word).strip()])
                         else:
-                            st.error(f"Stolpec '{col}' ni najden v naloženi CSV datoteki.")
+                            st.error(f"Stolpec '{col}' ni najden v naloženi datoteki.")
+                    unique_words_set = upload_uniques(
+                        fingerprint, uploaded_file, upload["format"], upload["delimiter"],
+                        upload_columns(upload, recognised_column_names), _table=df,
+                    )
 
                     # Convert the unique set back to a sorted string for display
                     unique_words_text = ", ".join(sorted(unique_words_set))
@@ -203,27 +259,23 @@ if selected_tab == "tab2":
                     )   
                     if len(recognised_column_names) > 0:
         
-                        def normalize(word):
-                            return re.sub(r"[^a-z0-9\sščž]", "", word.lower())
-
-                        unique_words_list = [normalize(word.strip()) for word in unique_words_area.split(",")]
-
-
-                        recommended_list = []
-
-
-                        for word in unique_words_list:
-                            # Check if the word matches an existing recommended word
-                            if recommended_list:
-                                match_result = process.extractOne(word, recommended_list, scorer=fuzz.ratio)
-                                match = match_result[0] if match_result else None
-                                score = match_result[1] if match_result else 0
-                            else:
-                                match, score = None, 0
-
-                            # If no close match is found, add it to the recommended list
-                            if score < 85:  
-                                recommended_list.append(word)
+                        unique_words_list = [normalize_word(word) for word in unique_words_area.split(",")]
+
+                        # Število vrstic za vsako normalizirano besedo, da je predstavnik skupine najpogostejši zapis
+                        cluster_columns = tuple(recognised_column_names)
+                        counts = word_counts(fingerprint, cluster_columns, df)
+                        clusters = word_clusters(fingerprint, cluster_columns, tuple(unique_words_list), counts)
+                        recommended_list = [representative for representative, _, _ in clusters]
+
+                        st.write("Skupine podobnih besed:")
+                        st.dataframe(
+                            pd.DataFrame(
+                                [(representative, count, ", ".join(members)) for representative, count, members in clusters],
+                                columns=["Predstavnik", "Število", "Člani"],
+                            ),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
                         st.write("Priporočen seznam besed:")
                         recomenders = st.text_area(
                             "Priporočene besede:",
@@ -233,8 +285,14 @@ if selected_tab == "tab2":
                         )
 
 
+                        new_scorer = st.selectbox("Ocenjevalnik podobnosti:", list(SCORERS), index=list(SCORERS).index(DEFAULT_SCORER))
+
                         st.subheader("Pravila za združevanje rezultatov:")
-                        new_mergers_df = pd.DataFrame(columns=["Izvirno ime", "Novo ime"])
+                        # Predizpolnjeno iz skupin: vsak član se združi v predstavnika
+                        new_mergers_df = pd.DataFrame(
+                            list(cluster_mergers(clusters).items()),
+                            columns=["Izvirno ime", "Novo ime"]
+                        )
                         new_mergers = st.data_editor(
                             new_mergers_df,
                             num_rows="dynamic",
@@ -269,16 +327,21 @@ if selected_tab == "tab2":
 
 
                         if st.button("Dodaj use case"):
-                            if new_use_case_name:
+                            problems = rule_problems(dict(new_mergers.values), dict(new_renamers.values))
+                            if problems:
+                                for problem in problems:
+                                    st.error(problem)
+                            elif new_use_case_name:
                                 if new_use_case_name not in config["use_cases"]:
                                     config["use_cases"][new_use_case_name] = {
                                         "mergers": dict(new_mergers.values),
                                         "renamers": dict(new_renamers.values),
                                         "identificators": dict(new_identificators.values),
                                         "columns": columns,
-                                        "recomenders": recomenders
+                                        "recomenders": recomenders,
+                                        "scorer": new_scorer
                                     }
-                                    save_config(config)
+                                    save_use_case(new_use_case_name, config["use_cases"][new_use_case_name])
                                     st.success(f"Use case '{new_use_case_name}' uspešno dodan!")
                                 else:
                                     st.error(f"Use case '{new_use_case_name}' že obstaja.")
@@ -287,9 +350,9 @@ if selected_tab == "tab2":
 
 
                     else:
-                        st.error(f"Stolpci ne obstajajo v naloženi CSV datoteki.")
+                        st.error(f"Stolpci ne obstajajo v naloženi datoteki.")
             except pd.errors.EmptyDataError:
-                st.error("CSV datoteka je prazna ali ima napačno obliko.")
+                st.error("Datoteka je prazna ali ima napačno obliko.")
             except csv.Error:
                 st.error("Ni mogoče zaznati ločila v datoteki. Preverite, ali je datoteka pravilno oblikovana." )
             except Exception as e:
@@ -307,7 +370,7 @@ if selected_tab == "tab3":
                 del config["use_cases"][use_case_to_delete]
                 
                 # Save the updated configuration to the file
-                save_config(config)
+                delete_use_case(use_case_to_delete)
                 
                 st.success(f"Use case '{use_case_to_delete}' uspešno izbrisan!")
             except Exception as e:
@@ -1,11 +1,22 @@
 import streamlit as st
 import pandas as pd
-import Levenshtein
 import csv
-import copy
+import collections
+import contextlib
+import os
+import tempfile
 import logging
 import extra_streamlit_components as stx
-import yaml
+from matching import apply_threshold
+from config_store import config_version, load_config, usecase_version
+from pipeline import classify, review_keys, apply_overlay, review_groups, filter_review, page_count, review_page, suggestions_above, apply_rules, build_final_df, identifier_value_labels, stream_file
+from datafiles import UPLOAD_TYPES, EXPORT_FORMATS, STATS_FORMATS, STREAM_FORMATS, file_format, in_file_order, stats_names, write_table
+from instrumentation import StageRecorder, match_record, profiled
+from jobs import JobCancelled, JobManager
+from upload_cache import read_upload, upload_columns, upload_fingerprint, upload_info, upload_uniques
+from match_cache import MatchCache
+from rules import RuleSet, build_exact_index
+from normalization import normalization_options
 
 
 logging.basicConfig(level=logging.INFO)
@@ -26,36 +37,289 @@ def validate_words(input_string):
     else:
         return None
 
-def process_csv(df, column, words):
+def refresh_usecase():
+    """Prevzame spremembe use_cases.yaml (npr. iz admin.py) brez ponovnega nalaganja strani.
+
+    Datoteka se ponovno prebere samo, ko se spremeni njena različica.
+    Pravila, urejena v tab 5 te seje, imajo še vedno prednost.
+    """
+    if 'usecase_name' not in st.session_state:
+        return
+    version = config_version()
+    if st.session_state.get('config_version') == version:
+        return
+    st.session_state['config_version'] = version
+    usecase = load_config()["use_cases"].get(st.session_state['usecase_name'])
+    if usecase is not None and usecase != st.session_state['usecase']:
+        st.session_state['usecase'] = usecase
+        st.toast("Nastavitve use case-a so bile posodobljene.")
+        log_message(f"use case {st.session_state['usecase_name']} posodobljen iz konfiguracije")
+
+# Koliko zadnjih meritev korakov ostane v seji
+MAX_STAGE_RECORDS = 100
+
+def get_recorder():
+    """Meritve korakov te seje; prikazane so v stranski vrstici."""
+    return StageRecorder(st.session_state.setdefault('stage_records', []), limit=MAX_STAGE_RECORDS)
+
+def show_instrumentation():
+    """Stranska vrstica: meritve korakov in profil zadnje profilirane klasifikacije."""
+    with st.sidebar.expander("Meritve korakov"):
+        records = st.session_state.get('stage_records', [])
+        if records:
+            st.dataframe(pd.DataFrame(records[::-1]), hide_index=True)
+        else:
+            st.caption("Ni še meritev.")
+        st.checkbox("Profiliraj naslednjo klasifikacijo", key="profile_next")
+        if 'profile_report' in st.session_state:
+            st.caption(f"Profil zadnje klasifikacije ({st.session_state['profile_report']['orodje']}):")
+            st.code(st.session_state['profile_report']['porocilo'], language=None)
+
+def prepared_download(key, prepare, file_name, mime):
+    """Gumb za prenos datoteke, ki jo prepare() pripravi šele po kliku "Pripravi prenos".
+
+    st.download_button podatke drži v pomnilniku in jih prejme ob vsakem
+    izvajanju skripte, zato jih pripravimo enkrat za key in jih hranimo v
+    seji, dokler se key (npr. rezultat in oblika) ne spremeni.
+    """
+    prepared = st.session_state.get('prepared_download')
+    if prepared is None or prepared[0] != key:
+        if not st.button("Pripravi prenos"):
+            return
+        try:
+            with st.spinner('Pripravljam datoteko za prenos...'):
+                prepared = (key, prepare())
+        except Exception as e:
+            st.error(f"Prišlo je do napake pri pripravi datoteke za prenos: {e}")
+            return
+        st.session_state['prepared_download'] = prepared
+    st.download_button(label="Prenesi končne podatke", data=prepared[1], file_name=file_name, mime=mime)
+
+def discard_stream_output():
+    """Izbriše rezultat pretočne obdelave te seje in pripravljen prenos zanj."""
+    output_path = st.session_state.pop('stream_output', None)
+    st.session_state.pop('stream_output_for', None)
+    if output_path is None:
+        return
+    prepared = st.session_state.get('prepared_download')
+    if prepared is not None and prepared[0][0] == output_path:
+        del st.session_state['prepared_download']
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+def new_stream_output(extension, fingerprint):
+    """Pot za nov rezultat pretočne obdelave; prejšnji rezultat seje se izbriše.
+
+    Rezultati so v začasni mapi seje. TemporaryDirectory mapo izbriše, ko se
+    seja konča in se njeno stanje sprosti, ali ob izhodu procesa.
+    """
+    discard_stream_output()
+    if 'stream_dir' not in st.session_state:
+        st.session_state['stream_dir'] = tempfile.TemporaryDirectory(prefix="pretocno_")
+    with tempfile.NamedTemporaryFile(dir=st.session_state['stream_dir'].name, suffix=extension, delete=False) as output_file:
+        st.session_state['stream_output'] = output_file.name
+    st.session_state['stream_output_for'] = fingerprint
+    return output_file.name
+
+def get_overlay():
+    """Ročne odločitve za vse stolpce: {normalizirana vrednost: izbrana beseda}."""
+    return st.session_state.get('review_overlay', {})
+
+def set_decisions(decisions):
+    """Doda ročne odločitve; rezultati iz tab 2 ostanejo nespremenjeni."""
+    if not decisions:
+        return
+    st.session_state.setdefault('review_overlay', {}).update(decisions)
+    st.session_state['overlay_version'] = st.session_state.get('overlay_version', 0) + 1
+
+def get_review_keys():
+    """Normalizirane vrednosti obdelanih stolpcev; izračunajo se enkrat na obdelavo."""
+    processed_ids = [id(processed_df) for processed_df in st.session_state['processed_dfs']]
+    if st.session_state.get('review_keys_for') != processed_ids:
+        st.session_state['review_keys_for'] = processed_ids
+        st.session_state['review_keys'] = [
+            review_keys(processed_df, column, st.session_state['usecase'].get("normalization"))
+            for processed_df, column in zip(st.session_state['processed_dfs'], st.session_state['recognised_column_names'])
+        ]
+    return st.session_state['review_keys']
+
+def get_review_groups():
+    """Skupine za pregled; izračunajo se znova samo ob novi obdelavi, pragu ali ročni odločitvi."""
+    groups_key = (
+        [id(processed_df) for processed_df in st.session_state['processed_dfs']],
+        id(get_review_keys()),
+        st.session_state['similarity_threshold'],
+        st.session_state.get('overlay_version', 0),
+    )
+    if st.session_state.get('review_groups_for') != groups_key:
+        st.session_state['review_groups'] = review_groups(
+            st.session_state['processed_dfs'],
+            st.session_state['recognised_column_names'],
+            get_review_keys(),
+            get_overlay(),
+        )
+        st.session_state['review_groups_for'] = groups_key
+    return st.session_state['review_groups']
+
+REVIEW_PAGE_SIZES = [25, 50, 100, 200]
+
+def review_grid(key_prefix, edit_matches=False):
+    """Vrednosti za pregled iz vseh stolpcev, združene po normalizirani vrednosti, v enem st.data_editor.
+
+    Vsaka različna vrednost se pojavi enkrat, odločitev zanjo pa velja za vse
+    njene vrstice v vseh stolpcih. Izriše se največ ena stran, zato čas izrisa
+    ni odvisen od števila vrstic za pregled. Z edit_matches se najboljše
+    ujemanje izbira iz besed.
+    """
+    groups = get_review_groups()
+
+    filter_cols = st.columns([2, 1, 1])
+    with filter_cols[0]:
+        query = st.text_input("Išči med vrednostmi", key=f"{key_prefix}_query")
+    with filter_cols[1]:
+        min_score = st.number_input("Najmanjše razmerje", 0.0, 1.0, 0.0, 0.05, key=f"{key_prefix}_min_score")
+    with filter_cols[2]:
+        page_size = st.selectbox("Vrednosti na stran", REVIEW_PAGE_SIZES, key=f"{key_prefix}_page_size")
+    filtered = filter_review(groups, query, min_score or None, st.session_state['usecase'].get("normalization"))
+    if filtered.empty:
+        st.info("Ni vrednosti za pregled.")
+        return
+
+    pages = page_count(len(filtered), page_size)
+    page = st.number_input(f"Stran (od {pages})", 1, pages, 1, key=f"{key_prefix}_page") - 1
+    page_df = review_page(filtered, page, page_size)
+    st.caption(
+        f"{len(filtered)} od {len(groups)} različnih vrednosti za pregled "
+        f"({int(groups['stevilo'].sum())} vrstic)."
+    )
 
-    # Preveri, ali stolpec obstaja
-    if column not in df.columns:
-        st.error(f"Stolpec '{column}' ni v naloženi CSV datoteki.")
-        return None
+    grid = page_df.reset_index()[['vrednost', 'stevilo', 'najboljse_ujemanje', 'razmerje', 'stolpci', 'primeri']]
+    suggestions = grid['najboljse_ujemanje'].copy()
+    options = list(st.session_state['words'])
+    if edit_matches:
+        # Kot prej pri ročni klasifikaciji: predlog, ki ni med besedami, je vnaprej "neznano" in se tako tudi shrani
+        if "neznano" not in options:
+            options.append("neznano")
+        grid['najboljse_ujemanje'] = grid['najboljse_ujemanje'].where(grid['najboljse_ujemanje'].isin(options), "neznano")
+    grid['Sprejmi'] = False
+    edited = st.data_editor(
+        grid,
+        hide_index=True,
+        use_container_width=True,
+        disabled=["vrednost", "stevilo", "razmerje", "stolpci", "primeri"] + ([] if edit_matches else ["najboljse_ujemanje"]),
+        column_config={
+            "vrednost": st.column_config.TextColumn("Vrednost"),
+            "stevilo": st.column_config.NumberColumn("Število vrstic"),
+            "najboljse_ujemanje": st.column_config.SelectboxColumn(
+                "Najboljše ujemanje", options=options
+            ),
+            "razmerje": st.column_config.NumberColumn("Razmerje", format="%.2f"),
+            "stolpci": st.column_config.TextColumn("Stolpci"),
+            "primeri": st.column_config.TextColumn("Primeri"),
+            "Sprejmi": st.column_config.CheckboxColumn("Označi kot pregledano"),
+        },
+        # Ključ vsebuje stran in filter, da se urejanja ne prenesejo na drugo stran
+        key=f"{key_prefix}_grid_{page}_{page_size}_{query}_{min_score}_{st.session_state.get('overlay_version', 0)}",
+    )
 
-    # Izračunaj Levenshteinove razmerje
-    def find_best_match(value, reference_names):
-        if pd.isna(value) or value.strip() == "":
-            return None, None, None
-        best_match = None
-        highest_similarity = 0
-        for name in reference_names:
-            similarity = Levenshtein.ratio(value.lower(), name.lower())
-            if similarity > highest_similarity:
-                highest_similarity = similarity
-                best_match = name
-
-        if highest_similarity > st.session_state['similarity_threshold']:
-            return best_match, highest_similarity, False
-        else:
-            return best_match, highest_similarity, True
+    action_cols = st.columns(2)
+    with action_cols[0]:
+        if st.button("Shrani stran", key=f"{key_prefix}_save"):
+            changed = edited['najboljse_ujemanje'].ne(suggestions) & edited['najboljse_ujemanje'].notna()
+            selected = edited[edited['Sprejmi'] | changed]
+            set_decisions(dict(zip(selected['vrednost'], selected['najboljse_ujemanje'])))
+            st.rerun()
+    with action_cols[1]:
+        accept_threshold = st.number_input(
+            "Sprejmi vse predloge z razmerjem nad", 0.0, 1.0, 0.6, 0.05, key=f"{key_prefix}_accept"
+        )
+        if st.button("Sprejmi vse", key=f"{key_prefix}_accept_all"):
+            # Velja za vse filtrirane vrednosti, ne samo za prikazano stran
+            set_decisions(suggestions_above(filtered, accept_threshold))
+            st.rerun()
+
+@st.cache_resource
+def get_match_cache():
+    """Trajni predpomnilnik ujemanj, skupen vsem sejam v procesu."""
+    return MatchCache()
+
+@st.cache_resource(max_entries=32)
+def get_exact_index(version, words, _usecase):
+    """Indeks točnih ujemanj (samo za branje), skupen vsem sejam; ključ je različica use case-a in seznam besed."""
+    return build_exact_index(_usecase, words)
+
+@st.cache_resource(max_entries=32)
+def get_rule_set(mergers, renamers, identifiers, normalization):
+    """Prevedena pravila (RuleSet), skupna vsem sejam z enakimi pravili in normalizacijo; podana so kot tuple parov."""
+    return RuleSet(dict(mergers), dict(renamers), dict(identifiers), normalization)
+
+@st.cache_resource
+def get_job_manager():
+    """Opravila v ozadju, skupna vsem sejam v procesu."""
+    return JobManager()
+
+# Kako pogosto (v sekundah) se osveži napredek klasifikacije v ozadju
+JOB_POLL_SECONDS = 0.5
+
+def run_classification(df, columns, words, threshold, usecase, cache, exact_index, recorder, profile, progress=None):
+    """Klasifikacija v ozadju; vrne (rezultati, viri ujemanj, profil ali None).
+
+    Teče v niti JobManager, ki nima dostopa do st.session_state, zato so vsi
+    podatki iz seje podani kot argumenti.
+    """
+    stats = collections.Counter()
+    with recorder.stage("klasifikacija", vrstice=len(df) * len(columns)) as record, \
+            (profiled() if profile else contextlib.nullcontext()) as profile_report:
+        processed_dfs = classify(
+            df, columns, words, threshold, usecase,
+            cache=cache, exact_index=exact_index, stats=stats, progress=progress,
+        )
+        match_record(record, stats)
+        # Različne vrednosti po stolpcih
+        record["stolpci"] = ", ".join(
+            f"{column}: {processed_df[column].nunique()}" for column, processed_df in zip(columns, processed_dfs)
+        )
+    return processed_dfs, stats, profile_report
+
+def start_classification(df, columns, words, key):
+    """Zažene klasifikacijo izbranih stolpcev v ozadju in vrne opravilo (Job).
+
+    Seje z enakim key (datoteka, stolpci, besede, prag, use case) si delijo
+    isto opravilo; profilirana klasifikacija teče posebej.
+    """
+
+    # Preveri, ali stolpci obstajajo
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        st.error(f"Stolpec '{missing[0]}' ni v naloženi CSV datoteki.")
+        return None
 
-    # Uporabi funkcijo na določen stolpec
-    df['najboljse_ujemanje'], df['razmerje'], df['za_pregled'] = zip(
-        *df[column].astype(str).apply(lambda x: find_best_match(x, words))
+    # Profilira se samo ena klasifikacija
+    profile = st.session_state.get('profile_next', False)
+    st.session_state['profile_next'] = False
+    usecase = st.session_state['usecase']
+    return get_job_manager().submit(
+        run_classification,
+        df, columns, words, st.session_state['similarity_threshold'], usecase,
+        get_match_cache(), get_exact_index(usecase_version(usecase), tuple(words), usecase), get_recorder(), profile,
+        key=None if profile else key,
     )
 
-    return df[[column, 'najboljse_ujemanje', 'razmerje', 'za_pregled']]
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def classification_progress(job_id, columns):
+    """Napredek klasifikacije v ozadju; ko je končana, se stran zažene znova in prevzame rezultat."""
+    job = get_job_manager().get(job_id)
+    if job is None or job.done():
+        st.rerun()
+    st.progress(job.fraction(), text=f"Klasificiram ... {int(job.fraction() * 100)} %")
+    for column in columns:
+        fraction = job.progress.get(column, 0.0)
+        st.progress(fraction, text=f"{column}: {int(fraction * 100)} %" if fraction else f"{column}: čakam ...")
+    if st.button("Prekliči klasifikacijo", key="cancel_classification"):
+        # Opravilo se prekliče, ko ga ne čaka nobena druga seja
+        get_job_manager().discard(job_id)
+        st.session_state['classify_job'] = None
+        st.rerun()
 
 st.set_page_config(layout="wide")
 tabs = [
@@ -71,10 +335,7 @@ tabs = [
 # Create the TabBar with the first tab selected by default
 selected_tab = stx.tab_bar(data=tabs, default="tab1")
 
-def load_config(file_path="use_cases.yaml"):
-    with open(file_path, "r") as file:
-        return yaml.safe_load(file)
-
+refresh_usecase()
 
 cols = st.columns([2, 8, 2])  # Create three columns, the middle one takes most space
 
@@ -84,6 +345,21 @@ if selected_tab == "tab1":
         st.header("1. Nastavitve")
         if 'processed_dfs' in st.session_state:
             st.write("Če želite ponovno vnesti podatke osvežite stran.")
+            if 'done2_state' not in st.session_state:
+                # Pred pregledom lahko prag spremenimo brez ponovnega ocenjevanja
+                similarity_threshold = st.slider(
+                    "Izberite prag podobnosti za ujemanje:",
+                    min_value=0.1,
+                    max_value=0.9,
+                    value=st.session_state['similarity_threshold'],
+                    step=0.1
+                )
+                if similarity_threshold != st.session_state['similarity_threshold']:
+                    st.session_state['similarity_threshold'] = similarity_threshold
+                    for processed_df in st.session_state['processed_dfs']:
+                        apply_threshold(processed_df, similarity_threshold)
+                        processed_df.sort_values(by="za_pregled", ascending=False, inplace=True)
+                    st.session_state['processed_version'] = st.session_state.get('processed_version', 0) + 1
         else:
             config = load_config()
             # Display a selectbox for the user to choose a use case
@@ -101,6 +377,8 @@ if selected_tab == "tab1":
 
             # Fetch the selected use case settings
             st.session_state['usecase'] = config["use_cases"][selected_use_case_name]
+            st.session_state['usecase_name'] = selected_use_case_name
+            st.session_state['config_version'] = config_version()
 
 
 # Tab 2: Input Data
@@ -112,9 +390,16 @@ elif selected_tab == "tab2":
                 st.write("Če želite ponovno vnesti podatke osvežite stran.")
             else:
             
-                st.write("Naloži CSV datoteko in izberi stolpce.")
+                st.write("Naloži datoteko (CSV, Parquet, Feather, SPSS ali Stata) in izberi stolpce.")
                 # File uploader
-                uploaded_file = st.file_uploader("Naloži CSV", type="csv")
+                uploaded_file = st.file_uploader("Naloži datoteko", type=UPLOAD_TYPES)
+                # Rezultat pretočne obdelave velja samo za datoteko, iz katere je nastal
+                if st.session_state.get('stream_output_for') != (upload_fingerprint(uploaded_file) if uploaded_file else None):
+                    discard_stream_output()
+                stream_mode = st.checkbox(
+                    "Pretočna obdelava velike datoteke (brez ročnega pregleda)",
+                    help="Datoteka se obdela po kosih in rezultat zapiše neposredno v datoteko za prenos."
+                )
 
                 recognised_column_names = []
                 processed_dfs = []
@@ -124,21 +409,15 @@ elif selected_tab == "tab2":
                     
                     have_delimiter = False
                     try:
-                        uploaded_file.seek(0)  
-                        sample = uploaded_file.read(1024).decode('utf-8')  
-                        uploaded_file.seek(0)  
-                        detected_delimiter = csv.Sniffer().sniff(sample).delimiter 
-                        have_delimiter = True
-                    except csv.Error:
-                        detected_delimiter = ';'
+                        # Oblika, ločilo in stolpci se določijo enkrat za vsebino datoteke
+                        fingerprint = upload_fingerprint(uploaded_file)
+                        upload = upload_info(fingerprint, uploaded_file, uploaded_file.name)
                         have_delimiter = True
                     except Exception as e:
                         st.error(f"Prišlo je do napake pri branju datoteke: {e}")    
                     if have_delimiter == True:      
                         try:
-
-                            df = pd.read_csv(uploaded_file, delimiter=detected_delimiter)
-                            st.session_state['initial_df'] = df
+                            df_columns = upload["columns"]
                             unique_words_set = set()  # Use a set to collect unique words
 
                             preselected = [col.strip() for col in st.session_state['usecase']["columns"].split(',')]
@@ -146,20 +425,38 @@ elif selected_tab == "tab2":
                             # Input for column name
                             selected_columns = st.multiselect(
                                 "Izberite stolpce za obdelavo:",
-                                options=df.columns.tolist(),
-                                default=[col for col in preselected if col in df.columns]
+                                options=df_columns,
+                                default=[col for col in preselected if col in df_columns]
+                            )
+                            carried_columns = st.multiselect(
+                                "Stolpci, ki se prenesejo v izvoz:",
+                                options=df_columns,
+                                default=df_columns
                             )
                             if len(selected_columns) > 0:
                                 column_name = ','.join(selected_columns)
                                 column_names = [col.strip() for col in column_name.split(',')]
                                 for col in column_names:
-                                    if col in df.columns:
+                                    if col in df_columns:
                                         recognised_column_names.append(col)
-                                        unique_words = df[col].dropna().unique()
-                                        # Strip words, filter out empty strings, and add unique words to the set
-                                        unique_words_set.update([word.strip() for word in unique_words if str(word).strip()])
                                     else:
-                                        st.error(f"Stolpec '{col}' ni najden v naloženi CSV datoteki.")
+                                        st.error(f"Stolpec '{col}' ni najden v naloženi datoteki.")
+                                needed_columns = in_file_order(set(carried_columns) | set(recognised_column_names), df_columns)
+                                if stream_mode and recognised_column_names:
+                                    # Pri pretočni obdelavi vrednosti vseh izbranih stolpcev beremo po kosih v enem prehodu
+                                    unique_words_set = upload_uniques(
+                                        fingerprint, uploaded_file, upload["format"], upload["delimiter"],
+                                        upload_columns(upload, recognised_column_names), streamed=True,
+                                        _recorder=get_recorder(),
+                                    )
+                                elif recognised_column_names:
+                                    # Prebrani stolpci se shranijo; izbira besed jih ne prebere ponovno
+                                    df = read_upload(uploaded_file, upload, needed_columns, recorder=get_recorder())
+                                    st.session_state['initial_df'] = df
+                                    unique_words_set = upload_uniques(
+                                        fingerprint, uploaded_file, upload["format"], upload["delimiter"],
+                                        upload_columns(upload, recognised_column_names), _table=df,
+                                    )
 
                                 # Convert the unique set back to a sorted string for display
                                 unique_words_text = ", ".join(sorted(unique_words_set))
@@ -182,9 +479,9 @@ elif selected_tab == "tab2":
                                         label_visibility="collapsed"
                                     )
                                 else:
-                                    st.error(f"Stolpci ne obstajajo v naloženi CSV datoteki.")
+                                    st.error(f"Stolpci ne obstajajo v naloženi datoteki.")
                         except pd.errors.EmptyDataError:
-                            st.error("CSV datoteka je prazna ali ima napačno obliko.")
+                            st.error("Datoteka je prazna ali ima napačno obliko.")
                         except csv.Error:
                             st.error("Ni mogoče zaznati ločila v datoteki. Preverite, ali je datoteka pravilno oblikovana." )
                         except Exception as e:
@@ -208,30 +505,106 @@ elif selected_tab == "tab2":
                     else:
                         st.success(f"Veljaven vnos. Za klasifikacijo uporabljenih {len(words)} besed.")
 
+                # Pretočna obdelava: rezultat gre neposredno v začasno datoteko za prenos
+                if stream_mode and uploaded_file and word_input and words and len(recognised_column_names) > 0:
+                    stream_format = st.radio("Oblika izvoza:", STREAM_FORMATS, horizontal=True, key="stream_format")
+                    if st.button("Obdelaj datoteko"):
+                        try:
+                            new_stream_output(EXPORT_FORMATS[stream_format][1], upload_fingerprint(uploaded_file))
+                            match_stats = collections.Counter()
+                            with st.spinner('Klasificiram podatke po kosih...'), get_recorder().stage("pretocno", datoteka=uploaded_file.name) as record:
+                                skipped_columns = stream_file(
+                                    uploaded_file,
+                                    st.session_state['stream_output'],
+                                    st.session_state['usecase'],
+                                    words,
+                                    st.session_state['similarity_threshold'],
+                                    columns=recognised_column_names,
+                                    cache=get_match_cache(),
+                                    stats=match_stats,
+                                    input_columns=needed_columns,
+                                )
+                                match_record(record, match_stats)
+                            for skipped_column in skipped_columns:
+                                st.warning(f"Stolpec '{skipped_column}' že obstaja v končni datoteki.")
+                            st.success("Datoteka uspešno obdelana!")
+                            log_message(f"tab2 pretočno, viri ujemanj: {dict(match_stats)}")
+                        except Exception as e:
+                            st.error(f"Prišlo je do napake pri obdelavi podatkov: {e}")
+                    if 'stream_output' in st.session_state and os.path.exists(st.session_state['stream_output']):
+                        output_path = st.session_state['stream_output']
+                        output_extension = os.path.splitext(output_path)[1]
+                        st.caption(f"Rezultat je shranjen na strežniku: {output_path}")
+
+                        def read_output():
+                            with open(output_path, 'rb') as output_file:
+                                return output_file.read()
+
+                        # Prenos celoten rezultat naloži v pomnilnik, zato ga pripravimo samo na zahtevo
+                        prepared_download(
+                            (output_path, os.path.getmtime(output_path)),
+                            read_output,
+                            "končni_podatki" + output_extension,
+                            EXPORT_FORMATS[file_format(output_path)][0],
+                        )
+
                 # Process CSV if everything is valid
-                if uploaded_file and word_input and len(recognised_column_names) > 0:
+                elif uploaded_file and word_input and words and len(recognised_column_names) > 0:
                     try:
-                        uploaded_file.seek(0)  # Reset file pointer before processing again
-                        
-                        with st.spinner('Klasificiram podatke...'):
-                            df = pd.read_csv(uploaded_file, delimiter=detected_delimiter)   
-                            for column_name in recognised_column_names:  
-                                processed_df = process_csv(df, column_name, words)
-                                processed_df.sort_values(by="za_pregled", ascending=False, inplace=True)
-                                processed_dfs.append(processed_df)
-                            
-                        if len(processed_dfs) > 0 and 'processed_dfs' not in st.session_state:
-                            
-                            st.session_state['processed_dfs'] = processed_dfs
-    
-                            st.session_state['recognised_column_names'] = recognised_column_names
-                            st.session_state['words'] = words
-                            st.success("CSV datoteka uspešno obdelana!")
-
-
-                            log_message("tab2 CSV :)")
+                        # Uporabimo že prebrano datoteko namesto ponovnega branja
+                        df = st.session_state['initial_df']
+                        manager = get_job_manager()
+                        # Klasifikacija teče v ozadju; znova se zažene samo ob spremembi datoteke, stolpcev, besed ali praga
+                        job_key = (
+                            upload_fingerprint(uploaded_file), tuple(recognised_column_names), tuple(words),
+                            st.session_state['similarity_threshold'], usecase_version(st.session_state['usecase']),
+                        )
+                        if st.session_state.get('classify_job_key') != job_key:
+                            manager.discard(st.session_state.get('classify_job'))
+                            job = start_classification(df, recognised_column_names, words, job_key)
+                            st.session_state['classify_job'] = job.id if job else None
+                            st.session_state['classify_job_key'] = job_key
+                        job = manager.get(st.session_state.get('classify_job'))
+
+                        if job is None:
+                            st.info("Klasifikacija ni v teku.")
+                            if st.button("Zaženi klasifikacijo"):
+                                del st.session_state['classify_job_key']
+                                st.rerun()
+                        elif not job.done():
+                            classification_progress(job.id, recognised_column_names)
                         else:
-                            st.error("Napaka pri obdelavi CSV datoteke.")
+                            manager.discard(job.id)
+                            st.session_state['classify_job'] = None
+                            processed_dfs, match_stats, profile_report = job.result()
+                            # Rezultat je lahko skupen več sejam, seja pa ga spreminja (prag, razvrščanje)
+                            processed_dfs = [processed_df.copy() for processed_df in processed_dfs]
+                            if profile_report is not None:
+                                st.session_state['profile_report'] = profile_report
+
+                            if len(processed_dfs) > 0 and 'processed_dfs' not in st.session_state:
+
+                                st.session_state['processed_dfs'] = processed_dfs
+                                st.session_state['processed_version'] = st.session_state.get('processed_version', 0) + 1
+        
+                                st.session_state['recognised_column_names'] = recognised_column_names
+                                st.session_state['words'] = words
+                                st.success("CSV datoteka uspešno obdelana!")
+                                st.caption(
+                                    f"Točna ujemanja: {match_stats['tocno']} vrstic, "
+                                    f"iz predpomnilnika: {match_stats['predpomnilnik']}, "
+                                    f"mehko ocenjene: {match_stats['ocena']}, "
+                                    f"razdeljene na več odgovorov: {match_stats['razdeljeno']}, "
+                                    f"prazne: {match_stats['prazno']}"
+                                )
+                                log_message(f"tab2 viri ujemanj: {dict(match_stats)}")
+
+
+                                log_message("tab2 CSV :)")
+                            else:
+                                st.error("Napaka pri obdelavi CSV datoteke.")
+                    except JobCancelled:
+                        st.warning("Klasifikacija je bila preklicana.")
                     except Exception as e:
                         st.error(f"Prišlo je do napake pri obdelavi podatkov: {e}")
         else:
@@ -250,39 +623,8 @@ elif selected_tab == "tab3":
                 st.session_state['done2_state'] = done_checkbox  
 
             if not st.session_state['done2_state']:
-                selected_index = st.selectbox(
-                    "Izberite stolpec za prikaz podatkov:",
-                    range(len(st.session_state['recognised_column_names'])),
-                    format_func=lambda x: st.session_state['recognised_column_names'][x],
-                    key="selectbox_updated"
-                )
-
-                # Display the currently selected DataFrame in an editable data_editor
-                st.write(f"Prikazujem podatke za stolpec: {st.session_state['recognised_column_names'][selected_index]}")
-                df_to_review = st.session_state['processed_dfs'][selected_index][st.session_state['processed_dfs'][selected_index]['za_pregled'] == True]
-
-                if not df_to_review.empty:
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.write("Beseda")
-                    with col2:
-                        st.write("Najboljše ujemanje")
-                    with col3:
-                        st.write("Razmerje")
-                    with col4:
-                        st.write("Označi kot pregledano")
-                    for index, row in df_to_review.iterrows():
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.write(row[st.session_state['recognised_column_names'][selected_index]])
-                        with col2:
-                            st.write(row['najboljse_ujemanje'])
-                        with col3:
-                            st.write(row['razmerje'])
-                        with col4:
-                            if st.button(f"Označi kot pregledano", key=f"mark_reviewed_{selected_index}_{index}"):
-                                st.session_state['processed_dfs'][selected_index].at[index, 'za_pregled'] = False
-                                st.rerun()
+                st.write(f"Prikazujem podatke za stolpce: {', '.join(st.session_state['recognised_column_names'])}")
+                review_grid("review")
 
         else:
             st.warning("Najprej naloži in preglej podatke.")    
@@ -297,69 +639,8 @@ elif selected_tab == "tab4":
 
         if 'usecase' in st.session_state and 'processed_dfs' in st.session_state and 'done2_state' in st.session_state and st.session_state['done2_state']==True:
 
-            cols_rocna = st.columns([2, 1])
-
-            with cols_rocna[0]:
-                if "staging_changes" not in st.session_state:
-                    st.session_state["staging_changes"] = {}
-
-                # Work with a copy of processed_dfs to avoid modifying directly until necessary
-                processed_dfs = copy.deepcopy(st.session_state['processed_dfs'])
-
-                for df_index, processed_df in enumerate(processed_dfs):
-                    column_name = st.session_state['recognised_column_names'][df_index]
-
-                    # Ensure 'za_pregled' column has no NaN values
-                    if 'za_pregled' in processed_df.columns:
-                        processed_df['za_pregled'] = processed_df['za_pregled'].fillna(False)
-
-                    # Filter rows for manual classification
-                    df_to_check = processed_df[processed_df['za_pregled']].copy()
-
-                    if not df_to_check.empty:
-                        st.write(f"Besede za pregled v stolpcu '{column_name}':")
-
-                        # Dropdown options for manual classification
-                        dropdown_options = st.session_state['words']
-
-                        # Prepare a staging area for changes specific to the current dataframe
-                        if df_index not in st.session_state["staging_changes"]:
-                            st.session_state["staging_changes"][df_index] = df_to_check.copy()
-
-                        # Iterate over rows in the dataframe requiring review
-                        for index, row in df_to_check.iterrows():
-                            original_value = row[column_name]  # Original value for classification
-                            staged_row = st.session_state["staging_changes"][df_index].loc[index]
-
-                            # Selectbox for user input
-                            new_match = st.selectbox(
-                                f"Uredi najboljše ujemanje za vrstico {index + 1} (Prvotna vrednost: {original_value}):",
-                                options=dropdown_options,
-                                index=dropdown_options.index(staged_row['najboljse_ujemanje'])
-                                if staged_row['najboljse_ujemanje'] in dropdown_options
-                                else dropdown_options.index("neznano"),
-                                key=f"selectbox_{df_index}_{index}"
-                            )
-
-                            # Update the staging area with the new value
-                            st.session_state["staging_changes"][df_index].at[index, 'najboljse_ujemanje'] = new_match
-
-            with cols_rocna[1]:
-                if st.button("Shrani vse spremembe"):
-                    for df_index, staged_df in st.session_state["staging_changes"].items():
-                        # Update the original DataFrame with changes from the staging area
-                        for index in staged_df.index:
-                            original_value = st.session_state['processed_dfs'][df_index].loc[index, 'najboljse_ujemanje']
-                            new_value = staged_df.loc[index, 'najboljse_ujemanje']
-
-                            # Only mark 'za_pregled' as False if the value has changed
-                            if original_value != new_value:
-                                st.session_state['processed_dfs'][df_index].at[index, 'najboljse_ujemanje'] = new_value
-                                st.session_state['processed_dfs'][df_index].at[index, 'za_pregled'] = False
-
-                    # Clear the staging area after saving changes
-                    st.session_state["staging_changes"] = {}
-                    st.success("Vse spremembe so shranjene.")
+            # Ena mreža na stran namesto izbirnega polja za vsako vrstico
+            review_grid("manual", edit_matches=True)
 
         else:
             st.warning("Najprej naloži in preglej podatke.")
@@ -488,34 +769,30 @@ elif selected_tab == "tab6":
 
 
    
-            def zdruzi_best_match(name):
-                if name is None or pd.isna(name):
-                    return name  # Če je vrednost None ali NaN, jo pustimo nespremenjeno
-                return merge_edited_switcher.get(name.lower(), name)  
-            
-            def rename_best_match(name):
-                if name is None or pd.isna(name):
-                    return name  # Če je vrednost None ali NaN, jo pustimo nespremenjeno
-                return rename_edited_switcher.get(name.lower(), name)     
-            
-        # Funkcija za pridobitev identifikatorja
-            def get_identifier(name):
-                max_identifier = max(int(value) for value in edited_identifiers.values())
-                if name is None or pd.isna(name):
-                    return None  
-                return edited_identifiers.get(name.lower(), max_identifier)        
-    
-
-            processed_dfs = st.session_state['processed_dfs']
-            updated_dfs = copy.deepcopy(processed_dfs)
-
-            for df_index, processed_df in enumerate(processed_dfs):
-                
-                processed_df['najboljse_ujemanje'] = processed_df['najboljse_ujemanje'].apply(zdruzi_best_match)
-                updated_dfs[df_index]['najboljse_ujemanje'] = processed_df['najboljse_ujemanje'].apply(rename_best_match)
-                updated_dfs[df_index]['identifikator'] = processed_df['najboljse_ujemanje'].apply(get_identifier)
-                updated_dfs[df_index].drop(['za_pregled'], axis=1, inplace=True)
-                updated_dfs[df_index].drop(['razmerje'], axis=1, inplace=True)
+            # Pravila uporabimo samo, ko se spremenijo rezultati, pravila ali ročne odločitve
+            rules_key = (
+                st.session_state.get('processed_version', 0),
+                st.session_state.get('overlay_version', 0),
+                tuple(merge_edited_switcher.items()),
+                tuple(rename_edited_switcher.items()),
+                tuple(edited_identifiers.items()),
+                normalization_options(st.session_state['usecase'].get("normalization")),
+            )
+            if st.session_state.get('updated_key') != rules_key or 'updated_dfs' not in st.session_state:
+                try:
+                    rules = get_rule_set(*rules_key[2:])
+                except ValueError as e:
+                    st.error(f"Pravil ni mogoče uporabiti: {e}")
+                    st.stop()
+                reviewed_dfs = [
+                    apply_overlay(processed_df, keys, get_overlay())
+                    for processed_df, keys in zip(st.session_state['processed_dfs'], get_review_keys())
+                ]
+                with get_recorder().stage("pravila", vrstice=sum(len(reviewed_df) for reviewed_df in reviewed_dfs)):
+                    st.session_state['updated_dfs'] = apply_rules(reviewed_dfs, rules)
+                st.session_state['updated_key'] = rules_key
+                log_message("tab6 pravila uporabljena")
+            updated_dfs = st.session_state['updated_dfs']
 
 
             # Dropdown to select which updated_df DataFrame to display
@@ -531,7 +808,6 @@ elif selected_tab == "tab6":
 
             st.write(f"Posodobljeni podatki za stolpec '{selected_column}':")
             st.dataframe(df_to_display)
-            st.session_state['updated_dfs'] = updated_dfs    
             st.session_state['viewed_results'] = True
             log_message("tab6 viewed_results")
         else:
@@ -545,33 +821,61 @@ elif selected_tab == "tab7":
         if 'usecase' in st.session_state and 'updated_dfs' in st.session_state and 'initial_df' in st.session_state and 'recognised_column_names' in st.session_state and 'viewed_results' in st.session_state and st.session_state['viewed_results']==True:
             log_message("tab7 INNNNNN")
             initial_df = st.session_state['initial_df']
-            final_df = initial_df.copy()
-            updated_dfs = st.session_state['updated_dfs']
-            for df_index, updated_df in enumerate(updated_dfs):
-                column_name = st.session_state['recognised_column_names'][df_index]
+            for column_name in st.session_state['recognised_column_names']:
                 log_message("tab7 " + column_name + "_najboljse_ujemanje")
-                col_index = final_df.columns.get_loc(column_name) + 1
-
-                if column_name + "_najboljse_ujemanje" not in final_df.columns:
-                    final_df.insert(col_index, column_name + "_najboljse_ujemanje", updated_df['najboljse_ujemanje'])
-                else:
-                    st.warning(f"Stolpec '{column_name + '_najboljse_ujemanje'}' že obstaja v končni datoteki.")
-                if column_name + "R" not in final_df.columns:
-                    final_df.insert(col_index + 1, column_name + "R", updated_df['identifikator'])
-                else:
-                    st.warning(f"Stolpec '{column_name + 'R'}' že obstaja v končni datoteki.")
+            # Končno tabelo sestavimo samo, ko se spremenijo rezultati v tab 6 (updated_key)
+            updated_dfs = st.session_state['updated_dfs']
+            if st.session_state.get('final_for') != st.session_state['updated_key']:
+                with get_recorder().stage("priprava izvoza", vrstice=len(initial_df)):
+                    st.session_state['final_df'], st.session_state['final_skipped'] = build_final_df(
+                        initial_df,
+                        st.session_state['recognised_column_names'],
+                        updated_dfs,
+                    )
+                st.session_state['final_for'] = st.session_state['updated_key']
+            final_df = st.session_state['final_df']
+            for skipped_column in st.session_state['final_skipped']:
+                st.warning(f"Stolpec '{skipped_column}' že obstaja v končni datoteki.")
 
 
-            st.write(f"CSV za izvox':")
+            st.write(f"Podatki za izvoz:")
             st.dataframe(final_df)  
 
-
-            csv = final_df.to_csv(index=False, sep=';').encode('utf-8')
-            st.download_button(
-                label="Prenesi končni CSV",
-                data=csv,
-                file_name="končni_podatki.csv",
-                mime="text/csv",
+            export_format = st.radio("Oblika izvoza:", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+            export_mime, export_extension = EXPORT_FORMATS[export_format]
+            if export_format in STATS_FORMATS:
+                renamed = {column: name for column, name in stats_names(final_df.columns, export_format).items() if name != column}
+                if renamed:
+                    st.caption(
+                        "Imena stolpcev, ki jih SPSS/Stata ne dovoli, so prilagojena; izvirno ime je oznaka spremenljivke: "
+                        + ", ".join(f"{column} → {name}" for column, name in renamed.items())
+                    )
+            if 'edited_identifiers' in st.session_state:
+                export_identifiers = st.session_state['edited_identifiers']
+            else:
+                export_identifiers = st.session_state['usecase']["identificators"]
+
+            def export_data():
+                # write_table piše v datoteko (SPSS/Stata drugače ne gre), prenos pa potrebuje bajte
+                with tempfile.TemporaryDirectory() as export_dir:
+                    export_path = os.path.join(export_dir, "končni_podatki" + export_extension)
+                    # Stolpci <stolpec>R dobijo v SPSS/Stata izvozu oznake vrednosti iz identifikatorjev
+                    with get_recorder().stage("izvoz", vrstice=len(final_df), oblika=export_format):
+                        write_table(
+                            final_df, export_path, export_format,
+                            value_labels=identifier_value_labels(st.session_state['recognised_column_names'], export_identifiers),
+                        )
+                    with open(export_path, 'rb') as export_file:
+                        return export_file.read()
+
+            # Izvoz se zapiše šele po kliku in ostane pripravljen za te rezultate in to obliko
+            prepared_download(
+                (st.session_state['updated_key'], export_format, export_identifiers),
+                export_data,
+                "končni_podatki" + export_extension,
+                export_mime,
             )
         else:
-            st.warning("Ni končnih podatkov za prikaz!")                
\ No newline at end of file
+            st.warning("Ni končnih podatkov za prikaz!")                
+
+show_instrumentation()
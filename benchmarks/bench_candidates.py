@@ -0,0 +1,92 @@
+"""Skaliranje z velikostjo seznama besed: izčrpno ocenjevanje proti CandidateIndex v matching.py.
+
+Besede so naključna imena, vrednosti pa njihove različice s tipkarskimi
+napakami in nekaj naključnih nizov, ki nimajo ujemanja nad pragom. Za vsak
+prag se izmeri ocenjevanje z vsiljenim indeksom; stolpec samodejno pove, ali
+ga best_matches pri teh besedah in pragu uporabi (use_candidates).
+
+Zagon iz korena repozitorija:
+    python benchmarks/bench_candidates.py --values 20000 --sizes 1000 2000 5000 10000
+    python benchmarks/bench_candidates.py --thresholds 0.5 0.7 0.9
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matching import best_matches, use_candidates  # noqa: E402
+
+
+LETTERS = np.array(list("abcdefghijklmnoprstuvzščž"))
+
+
+def random_words(rng, count, low=4, high=14):
+    return list(dict.fromkeys(
+        "".join(rng.choice(LETTERS, rng.integers(low, high))) for _ in range(count * 2)
+    ))[:count]
+
+
+def typo(rng, word):
+    """Ena ali dve naključni napaki: zamenjava, izpust ali vrinjen znak."""
+    word = list(word)
+    for _ in range(rng.integers(1, 3)):
+        position = rng.integers(0, len(word))
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            word[position] = rng.choice(LETTERS)
+        elif kind == 1 and len(word) > 1:
+            del word[position]
+        else:
+            word.insert(position, rng.choice(LETTERS))
+    return "".join(word)
+
+
+def sample_values(rng, words, count, noise=0.1):
+    values = [typo(rng, words[position]) for position in rng.integers(0, len(words), count)]
+    for position in np.flatnonzero(rng.random(count) < noise):
+        values[position] = "".join(rng.choice(LETTERS, rng.integers(3, 12)))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, default=20000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"vrednosti: {args.values}")
+    print(f"{'besede':>8} {'prag':>6} {'izčrpno':>10} {'indeks':>10} {'pospešek':>9} {'samodejno':>10}  enak rezultat")
+    failed = False
+    for size in args.sizes:
+        words = random_words(rng, size)
+        values = sample_values(rng, words, args.values)
+
+        start = time.perf_counter()
+        expected = best_matches(values, words)
+        exhaustive_time = time.perf_counter() - start
+
+        for threshold in args.thresholds:
+            start = time.perf_counter()
+            result = best_matches(values, words, threshold=threshold, candidates=True)
+            index_time = time.perf_counter() - start
+
+            # Nad pragom morata biti ujemanje in razmerje enaka; pod pragom gre vrednost v izčrpno iskanje
+            same = np.array_equal(expected[0], result[0]) and np.array_equal(expected[1], result[1])
+            failed = failed or not same
+            chosen = "indeks" if use_candidates(words, threshold) else "izčrpno"
+            print(
+                f"{size:>8} {threshold:>6.2f} {exhaustive_time:>9.3f}s {index_time:>9.3f}s "
+                f"{exhaustive_time / index_time:>8.1f}x {chosen:>10}  {same}"
+            )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
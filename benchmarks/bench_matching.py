@@ -0,0 +1,92 @@
+"""Primerjava hitrosti: stara zanka z Levenshtein.ratio proti matriki v matching.py.
+
+Zagon iz korena repozitorija:
+    python benchmarks/bench_matching.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import Levenshtein
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matching import match_values  # noqa: E402
+
+
+WORDS = [
+    "telemach", "telekom", "a1", "a1 slovenija", "izimobil", "t2", "hofer", "simobil", "hot",
+    "bob", "amis", "apple", "ario", "debitel", "hot telekom", "hofer telekom", "t-2", "mobitel",
+    "izi", "spar", "spar mobil", "telekom slovenije", "izi mobil", "tuš mobil", "tuš", "re do",
+    "hot mobil", "siol", "re:do", "drugo", "ne vem", "neznano",
+]
+
+
+def legacy_match(series, words, threshold):
+    """Prvotna izvedba iz process_csv (zanka po vrsticah in besedah)."""
+    def find_best_match(value, reference_names):
+        if pd.isna(value) or value.strip() == "":
+            return None, None, None
+        best_match = None
+        highest_similarity = 0
+        for name in reference_names:
+            similarity = Levenshtein.ratio(value.lower(), name.lower())
+            if similarity > highest_similarity:
+                highest_similarity = similarity
+                best_match = name
+
+        if highest_similarity > threshold:
+            return best_match, highest_similarity, False
+        else:
+            return best_match, highest_similarity, True
+
+    result = pd.DataFrame(index=series.index)
+    result['najboljse_ujemanje'], result['razmerje'], result['za_pregled'] = zip(
+        *series.astype(str).apply(lambda x: find_best_match(x, words))
+    )
+    return result
+
+
+def load_values(path, rows):
+    df = pd.read_csv(path)
+    columns = [col for col in df.columns if col.startswith("Q1a_") and col.endswith("_other")]
+    values = pd.concat([df[col] for col in columns], ignore_index=True).astype(str)
+    repeats = -(-rows // len(values))
+    return pd.concat([values] * repeats, ignore_index=True).iloc[:rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--data", default="data/survey_more_fieds.csv")
+    args = parser.parse_args()
+
+    values = load_values(args.data, args.rows)
+
+    start = time.perf_counter()
+    expected = legacy_match(values, WORDS, args.threshold)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = match_values(values, WORDS, args.threshold)
+    matrix_time = time.perf_counter() - start
+
+    same = (
+        expected['najboljse_ujemanje'].equals(result['najboljse_ujemanje'])
+        and expected['za_pregled'].astype(object).equals(result['za_pregled'].astype(object))
+        and pd.to_numeric(expected['razmerje']).equals(pd.to_numeric(result['razmerje']))
+    )
+
+    print(f"vrstice: {len(values)}, besede: {len(WORDS)}")
+    print(f"zanka:   {legacy_time:8.3f} s")
+    print(f"matrika: {matrix_time:8.3f} s  ({legacy_time / matrix_time:.1f}x)")
+    print(f"enak rezultat: {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Časi posameznih korakov postopka na sintetičnih anketah različnih velikosti.
+
+Koraki so branje (read_table), klasifikacija (classify, tab 2), pravila
+(RuleSet in apply_rules, tab 6) in izvoz (build_final_df in write_table,
+tab 7). Ankete ustvari synthetic.py z istim seed, zato je tudi rezultat
+vedno enak; njegova zgoščena vrednost se primerja z osnovo.
+
+Osnova (benchmarks/baseline.json) velja za računalnik, na katerem je bila
+shranjena; po spremembi strojne opreme jo shranite znova z --save.
+
+Zagon iz korena repozitorija:
+    python benchmarks/bench_pipeline.py             # primerjava z osnovo
+    python benchmarks/bench_pipeline.py --save      # shrani novo osnovo
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, ".."))
+sys.path.insert(0, BENCHMARKS)
+
+from config_store import load_config  # noqa: E402
+from datafiles import read_table, write_table  # noqa: E402
+from pipeline import apply_rules, build_final_df, classify, split_names  # noqa: E402
+from rules import RuleSet  # noqa: E402
+from synthetic import DEFAULT_USE_CASE, generate_survey  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(BENCHMARKS, "baseline.json")
+STAGES = ["branje", "klasifikacija", "pravila", "izvoz"]
+# Velikosti: (vrstice, stolpci, različni odgovori)
+DEFAULT_SCALES = ["10000x3x200", "100000x5x5000", "500000x5x20000"]
+
+
+def parse_scale(text):
+    rows, columns, cardinality = (int(part) for part in text.split("x"))
+    return rows, columns, cardinality
+
+
+def checksum(df):
+    """Zgoščena vrednost vsebine DataFrame-a (neodvisna od tipov Arrow)."""
+    return hashlib.sha1(df.astype(str).to_csv(index=False).encode("utf-8")).hexdigest()[:16]
+
+
+def run_once(usecase, scale, threshold, typo_rate, directory):
+    """Izvede vse korake enkrat in vrne ({korak: sekunde}, zgoščena vrednost izvoza)."""
+    rows, columns, cardinality = parse_scale(scale)
+    survey, text_columns = generate_survey(usecase, rows, columns, cardinality, typo_rate)
+    input_path = os.path.join(directory, f"anketa_{scale}.csv")
+    output_path = os.path.join(directory, f"izvoz_{scale}.csv")
+    write_table(survey, input_path)
+    words = split_names(usecase["recomenders"])
+    times = {}
+
+    start = time.perf_counter()
+    df = read_table(input_path)
+    times["branje"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    processed_dfs = classify(df, text_columns, words, threshold, usecase, cache=None)
+    times["klasifikacija"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rules = RuleSet(usecase["mergers"], usecase["renamers"], usecase["identificators"], usecase.get("normalization"))
+    updated_dfs = apply_rules(processed_dfs, rules)
+    times["pravila"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    final_df, _ = build_final_df(df, text_columns, updated_dfs)
+    write_table(final_df, output_path)
+    times["izvoz"] = time.perf_counter() - start
+    return times, checksum(final_df)
+
+
+def measure(usecase, scale, threshold, typo_rate, repeat):
+    """Najkrajši čas vsakega koraka v repeat ponovitvah."""
+    best, digest = {}, None
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(repeat):
+            times, digest = run_once(usecase, scale, threshold, typo_rate, directory)
+            for stage, seconds in times.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+    return best, digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="vrstice x stolpci x različni odgovori")
+    parser.add_argument("--use-case", default=DEFAULT_USE_CASE)
+    parser.add_argument("--config", default="use_cases.yaml")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--typo-rate", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="shrani izmerjene čase kot novo osnovo")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="dovoljeno relativno poslabšanje")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="poslabšanja pod toliko sekundami se ne štejejo")
+    args = parser.parse_args()
+
+    usecase = load_config(args.config)["use_cases"][args.use_case]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    elif not args.save:
+        print(f"Osnova {args.baseline} ne obstaja; shranite jo z --save.")
+
+    results = {}
+    failed = False
+    print(f"{'velikost':>16} {'korak':>14} {'čas':>9} {'osnova':>9} {'razmerje':>9}")
+    for scale in args.scales:
+        times, digest = measure(usecase, scale, args.threshold, args.typo_rate, args.repeat)
+        results[scale] = {"casi": {stage: round(seconds, 4) for stage, seconds in times.items()}, "rezultat": digest}
+        expected = baseline.get(scale)
+        for stage in STAGES:
+            seconds = times[stage]
+            line = f"{scale:>16} {stage:>14} {seconds:>8.3f}s"
+            if expected:
+                reference = expected["casi"][stage]
+                slower = seconds > reference * (1 + args.tolerance) and seconds - reference > args.min_delta
+                failed = failed or (slower and not args.save)
+                line += f" {reference:>8.3f}s {seconds / reference:>8.2f}x" + ("  POČASNEJE" if slower else "")
+            print(line)
+        if expected and expected["rezultat"] != digest:
+            print(f"{scale:>16} rezultat se razlikuje od osnove ({digest} namesto {expected['rezultat']})")
+            failed = failed or not args.save
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, ensure_ascii=False, sort_keys=True)
+            file.write("\n")
+        print(f"Osnova shranjena v {args.baseline}.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
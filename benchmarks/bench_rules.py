@@ -0,0 +1,85 @@
+"""Primerjava hitrosti: stara uporaba pravil po vrsticah (.apply) proti RuleSet v rules.py.
+
+Zagon iz korena repozitorija:
+    python benchmarks/bench_rules.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rules import RuleSet  # noqa: E402
+
+
+def legacy_rules(matches, mergers, renamers, identifiers):
+    """Prvotna izvedba iz tab 6 (apply po vrsticah, največji identifikator za vsako vrstico)."""
+    def zdruzi_best_match(name):
+        if name is None or pd.isna(name):
+            return name
+        return mergers.get(name.lower(), name)
+
+    def rename_best_match(name):
+        if name is None or pd.isna(name):
+            return name
+        return renamers.get(name.lower(), name)
+
+    def get_identifier(name):
+        if name is None or pd.isna(name):
+            return None
+        return identifiers.get(name.lower(), str(max(int(value) for value in identifiers.values())))
+
+    merged = matches.apply(zdruzi_best_match)
+    return merged.apply(rename_best_match).astype(object), merged.apply(get_identifier).astype(object)
+
+
+def sample_matches(usecase, rows, seed=0):
+    """Naključna ujemanja iz besed in ključev pravil, z 10 % manjkajočih."""
+    names = [word.strip() for word in usecase["recomenders"].split(",") if word.strip()]
+    names += list(usecase["mergers"]) + list(usecase["renamers"])
+    rng = np.random.default_rng(seed)
+    values = np.array(names + [None], dtype=object)[rng.integers(0, len(names) + 1, rows)]
+    values[rng.random(rows) < 0.1] = None
+    return pd.Series(values, dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--config", default="use_cases.yaml")
+    parser.add_argument("--use-case", default="mobilni ponudniki")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as file:
+        usecase = yaml.safe_load(file)["use_cases"][args.use_case]
+    mergers, renamers, identifiers = usecase["mergers"], usecase["renamers"], usecase["identificators"]
+    matches = sample_matches(usecase, args.rows)
+
+    start = time.perf_counter()
+    expected_names, expected_identifiers = legacy_rules(matches, mergers, renamers, identifiers)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    names, identifiers_result = RuleSet(mergers, renamers, identifiers).apply(matches)
+    compiled_time = time.perf_counter() - start
+
+    same = expected_names.fillna("").equals(names.fillna(""))
+    # RuleSet določi identifikator iz končnega (preimenovanega) imena, stara pot iz združenega
+    changed = int((expected_identifiers.fillna("") != identifiers_result.fillna("")).sum())
+
+    print(f"vrstice: {len(matches)}")
+    print(f"apply:   {legacy_time:8.3f} s")
+    print(f"RuleSet: {compiled_time:8.3f} s  ({legacy_time / compiled_time:.1f}x)")
+    print(f"enaka imena: {same}")
+    print(f"vrstice z drugačnim identifikatorjem (končno ime namesto združenega): {changed}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
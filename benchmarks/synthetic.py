@@ -0,0 +1,116 @@
+"""Generator sintetičnih anket za merjenje hitrosti.
+
+Odgovori izhajajo iz besedišča use case-a (priporočene besede ter ključi
+mergers in renamers), zato so podobni pravim odgovorom v
+data/survey_more_fieds.csv: različne velike začetnice, presledki na robovih,
+tipkarske napake in prazne celice. Z istim seed je rezultat vedno enak.
+
+Zagon iz korena repozitorija:
+    python benchmarks/synthetic.py -o /tmp/anketa.csv --rows 100000 --columns 5 --cardinality 2000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config_store import load_config  # noqa: E402
+from datafiles import write_table  # noqa: E402
+from pipeline import split_names  # noqa: E402
+
+
+DEFAULT_USE_CASE = "mobilni ponudniki"
+LETTERS = np.array(list("abcdefghijklmnoprstuvzščž"))
+# Številski stolpci, kot so Demo_* in Q1a_* v pravih anketah
+NUMERIC_COLUMNS = 10
+
+
+def vocabulary(usecase):
+    """Besede use case-a: priporočene besede ter ključi mergers in renamers, brez podvojitev."""
+    words = split_names(usecase["recomenders"]) + list(usecase["mergers"]) + list(usecase["renamers"])
+    return list(dict.fromkeys(word for word in words if isinstance(word, str) and word.strip()))
+
+
+def typo(rng, word):
+    """Ena ali dve naključni napaki: zamenjava, izpust ali vrinjen znak."""
+    word = list(word)
+    for _ in range(rng.integers(1, 3)):
+        position = rng.integers(0, len(word))
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            word[position] = rng.choice(LETTERS)
+        elif kind == 1 and len(word) > 1:
+            del word[position]
+        else:
+            word.insert(position, rng.choice(LETTERS))
+    return "".join(word)
+
+
+def spelling(rng, word):
+    """Različica zapisa brez napake: velike ali male črke in presledki na robovih."""
+    variant = [word, word.lower(), word.upper(), word.capitalize()][rng.integers(0, 4)]
+    return " " * rng.integers(0, 2) + variant + " " * rng.integers(0, 2)
+
+
+def value_pool(rng, words, cardinality, typo_rate):
+    """Vrne cardinality različnih odgovorov; delež typo_rate ima tipkarske napake."""
+    pool = dict.fromkeys(words[:cardinality])
+    attempts = 0
+    while len(pool) < cardinality and attempts < cardinality * 20:
+        word = words[rng.integers(0, len(words))]
+        pool[typo(rng, word) if rng.random() < typo_rate else spelling(rng, word)] = None
+        attempts += 1
+    return list(pool)
+
+
+def generate_survey(usecase, rows, columns=3, cardinality=200, typo_rate=0.2, empty_rate=0.5, seed=0):
+    """Sintetična anketa kot DataFrame.
+
+    Besedilni stolpci imajo imena iz use case-a (columns), po potrebi pa
+    še <ime>_<n>. Pogostost odgovorov sledi Zipfovi porazdelitvi, delež
+    empty_rate celic je prazen.
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.array(value_pool(rng, vocabulary(usecase), cardinality, typo_rate), dtype=object)
+    weights = 1 / np.arange(1, len(pool) + 1)
+    weights /= weights.sum()
+
+    names = split_names(usecase["columns"])
+    text_columns = [
+        names[position] if position < len(names) else f"{names[position % len(names)]}_{position // len(names)}"
+        for position in range(columns)
+    ]
+    data = {f"Demo_{position}": rng.integers(1, 10, rows) for position in range(NUMERIC_COLUMNS)}
+    for column in text_columns:
+        values = pool[rng.choice(len(pool), rows, p=weights)]
+        values[rng.random(rows) < empty_rate] = None
+        data[column] = values
+    return pd.DataFrame(data), text_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", required=True, help="izhodna datoteka (.csv, .parquet, ...)")
+    parser.add_argument("--use-case", default=DEFAULT_USE_CASE)
+    parser.add_argument("--config", default="use_cases.yaml")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--cardinality", type=int, default=200, help="število različnih odgovorov")
+    parser.add_argument("--typo-rate", type=float, default=0.2, help="delež različnih odgovorov s tipkarsko napako")
+    parser.add_argument("--empty-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    usecase = load_config(args.config)["use_cases"][args.use_case]
+    df, text_columns = generate_survey(
+        usecase, args.rows, args.columns, args.cardinality, args.typo_rate, args.empty_rate, args.seed,
+    )
+    write_table(df, args.output)
+    print(f"{args.output}: {len(df)} vrstic, stolpci za klasifikacijo: {', '.join(text_columns)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import collections
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from normalization import normalize_text
+
+
+# Prag podobnosti (fuzz.ratio, 0-100), nad katerim sta besedi v isti skupini
+DEFAULT_THRESHOLD = 85
+
+# Do toliko besed primerjamo vse z vsemi, pri več pa samo znotraj blokov z največ toliko besedami
+FULL_MATRIX_LIMIT = 3000
+
+# Začetna dolžina predpone in pripone, po katerih se besede razdelijo v bloke
+BLOCK_KEY_LENGTH = 2
+
+
+def normalize_word(word):
+    """Male črke brez ločil (ohrani šumnike), kot jih uporablja priporočen seznam besed."""
+    return normalize_text(word, {"strip_punctuation": True})
+
+
+class UnionFind:
+    """Disjunktne množice nad indeksi 0..n-1 (s stiskanjem poti)."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def key_blocks(words, members, key, length, limit=FULL_MATRIX_LIMIT):
+    """Razdeli indekse members po key(beseda, length); bloke z več kot limit besedami razdeli z daljšim ključem."""
+    by_key = collections.defaultdict(list)
+    for position in members:
+        by_key[key(words[position], length)].append(position)
+    result = []
+    for block in by_key.values():
+        if len(block) > limit:
+            # Besede so različne, zato se blok z daljšim ključem sčasoma razdeli
+            result.extend(key_blocks(words, block, key, length + 1, limit))
+        elif len(block) > 1:
+            result.append(block)
+    return result
+
+
+def blocks(words, limit=FULL_MATRIX_LIMIT):
+    """Razdeli indekse besed v bloke po predponi in po priponi z največ limit besedami.
+
+    Vsaka beseda je v dveh blokih, zato se besedi s tipkarsko napako na
+    začetku še vedno srečata v bloku po priponi in obratno. Prevelik blok se
+    razdeli po daljši predponi oziroma priponi, da matrika podobnosti ostane
+    omejena.
+    """
+    if len(words) <= limit:
+        return [list(range(len(words)))]
+    members = range(len(words))
+    return (
+        key_blocks(words, members, lambda word, length: word[:length], BLOCK_KEY_LENGTH, limit)
+        + key_blocks(words, members, lambda word, length: word[-length:], BLOCK_KEY_LENGTH, limit)
+    )
+
+
+def cluster_words(words, counts=None, threshold=DEFAULT_THRESHOLD, workers=-1):
+    """Združi podobne besede v skupine.
+
+    Podobnosti se v vsakem bloku izračunajo naenkrat (process.cdist s
+    score_cutoff), pari nad pragom pa se združijo z union-find. Predstavnik
+    skupine je najpogostejša beseda glede na counts ({beseda: število}),
+    ob enakem številu pa tista, ki je prva v words.
+
+    Vrne seznam (predstavnik, število, člani), razvrščen po številu.
+    """
+    counts = counts or {}
+    words = list(dict.fromkeys(word for word in words if word))
+    groups = UnionFind(len(words))
+    for members in blocks(words):
+        block = [words[position] for position in members]
+        scores = process.cdist(block, block, scorer=fuzz.ratio, score_cutoff=threshold, dtype=np.float32, workers=workers)
+        # Vsak par enkrat, brez diagonale; np.triu bi naredil še eno kopijo matrike
+        firsts, seconds = np.nonzero(scores)
+        pairs = firsts < seconds
+        for first, second in zip(firsts[pairs], seconds[pairs]):
+            groups.union(members[first], members[second])
+
+    clusters = collections.defaultdict(list)
+    for position, word in enumerate(words):
+        clusters[groups.find(position)].append(word)
+
+    result = []
+    for members in clusters.values():
+        representative = max(members, key=lambda word: counts.get(word, 0))
+        result.append((representative, sum(counts.get(word, 0) for word in members), members))
+    result.sort(key=lambda cluster: cluster[1], reverse=True)
+    return result
+
+
+def cluster_mergers(clusters):
+    """Pravila za združevanje iz skupin: {član: predstavnik} za vse člane razen predstavnika."""
+    return {
+        member: representative
+        for representative, _, members in clusters
+        for member in members
+        if member != representative
+    }
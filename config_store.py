@@ -0,0 +1,119 @@
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import yaml
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: zaklepanje datoteke ni na voljo, ostane zaklep med nitmi
+    fcntl = None
+
+
+DEFAULT_PATH = "use_cases.yaml"
+
+# Prevajalnik libyaml je bistveno hitrejši; če ga ni, uporabimo čisti Python
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# {absolutna pot: (različica, razčlenjena konfiguracija)}
+_cache = {}
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def config_version(file_path=DEFAULT_PATH):
+    """Različica datoteke (inode, čas spremembe, velikost); spremeni se ob vsakem zapisu.
+
+    Zapis z os.replace ustvari novo datoteko, zato inode loči tudi zapise
+    znotraj iste ločljivosti časa spremembe.
+    """
+    status = os.stat(file_path)
+    return status.st_ino, status.st_mtime_ns, status.st_size
+
+
+def _parsed(file_path):
+    path = os.path.abspath(file_path)
+    version = config_version(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as file:
+        data = yaml.load(file, Loader=Loader)
+    with _lock:
+        _cache[path] = (version, data)
+    return data
+
+
+def usecase_version(usecase):
+    """Kratka zgoščena vrednost nastavitev use case-a; ključ za vire, skupne vsem sejam."""
+    text = json.dumps(usecase, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def load_config(file_path=DEFAULT_PATH):
+    """Vrne konfiguracijo iz use_cases.yaml.
+
+    Datoteka se razčleni samo, ko se spremeni (config_version), sicer se vrne
+    kopija shranjene konfiguracije, ki jo klicatelj lahko spreminja.
+    """
+    return copy.deepcopy(_parsed(file_path))
+
+
+@contextlib.contextmanager
+def _locked(file_path):
+    """Izključen zapis konfiguracije med procesi (flock na <pot>.lock) in nitmi."""
+    if fcntl is None:
+        with _write_lock:
+            yield
+        return
+    with open(os.path.abspath(file_path) + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write(data, file_path):
+    # Začasna datoteka v isti mapi, da je os.replace atomaren
+    directory = os.path.dirname(os.path.abspath(file_path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".use_cases.", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            yaml.dump(data, file, Dumper=Dumper, allow_unicode=True)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            # mkstemp ustvari datoteko z dovoljenji 0600; ohranimo dovoljenja izvirnika
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def save_config(data, file_path=DEFAULT_PATH):
+    """Atomarno zapiše celotno konfiguracijo (začasna datoteka + os.replace) pod zaklepom."""
+    with _locked(file_path):
+        _write(data, file_path)
+
+
+def update_config(change, file_path=DEFAULT_PATH):
+    """Pod zaklepom prebere trenutno konfiguracijo, jo spremeni s change(config) in atomarno zapiše.
+
+    Spremembe iz drugih sej admin.py med tem se ohranijo, ker se spreminja
+    sveže prebrana konfiguracija. Vrne novo konfiguracijo.
+    """
+    with _locked(file_path):
+        config = load_config(file_path)
+        change(config)
+        _write(config, file_path)
+    return config
@@ -0,0 +1,409 @@
+import contextlib
+import csv
+import os
+import re
+import tempfile
+import unicodedata
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pyreadstat
+
+
+DELIMITERS = ",;\t|"
+DEFAULT_CHUNKSIZE = 100000
+
+# Podprte oblike datotek glede na končnico
+FORMATS = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".sav": "sav",
+    ".zsav": "sav",
+    ".dta": "dta",
+}
+UPLOAD_TYPES = [extension.lstrip(".") for extension in FORMATS]
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/octet-stream", ".parquet"),
+    "feather": ("application/octet-stream", ".feather"),
+    "sav": ("application/x-spss-sav", ".sav"),
+    "dta": ("application/x-stata-dta", ".dta"),
+}
+# Oblike SPSS in Stata (pyreadstat)
+STATS_FORMATS = ["sav", "dta"]
+# Oblike, v katere lahko zapisujemo po kosih (pyreadstat ne zna dodajati)
+STREAM_FORMATS = ["csv", "parquet", "feather"]
+STATS_READERS = {"sav": pyreadstat.read_sav, "dta": pyreadstat.read_dta}
+STATS_WRITERS = {"sav": pyreadstat.write_sav, "dta": pyreadstat.write_dta}
+# Največja dolžina imena spremenljivke in oznake spremenljivke (None: brez omejitve)
+STATS_NAME_LIMITS = {"sav": 64, "dta": 32}
+STATS_LABEL_LIMITS = {"sav": None, "dta": 80}
+# Rezervirane besede SPSS in Stata, ki ne smejo biti ime spremenljivke (primerjava brez velikih črk)
+STATS_RESERVED = {
+    "all", "and", "by", "eq", "ge", "gt", "le", "lt", "ne", "not", "or", "to", "with",
+    "_all", "_b", "byte", "_coef", "_cons", "double", "float", "if", "in", "int", "long",
+    "_n", "_pi", "_pred", "_rc", "_skip", "strl", "using",
+}
+# Zapisi SPSS/Stata, ki jih pyreadstat pretvori v datume in čase
+STATS_DATE_FORMATS = re.compile(r"^(%-?t[cCdwmqhy]|%d|[AEJS]?DATE|DATETIME|YMDHMS|MOYR|QYR|WKYR|DTIME|TIME)", re.IGNORECASE)
+
+
+def file_format(name):
+    """Vrne obliko datoteke iz FORMATS (csv, parquet, feather, sav ali dta) glede na končnico imena.
+
+    Neznana končnica sproži ValueError.
+    """
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Nepodprta oblika datoteke: '{extension}'.")
+    return FORMATS[extension]
+
+
+@contextlib.contextmanager
+def local_path(file, fmt):
+    """Pot do datoteke na disku; naložena datoteka se začasno zapiše (pyreadstat bere samo poti)."""
+    if isinstance(file, (str, os.PathLike)):
+        yield str(file)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "upload." + fmt)
+        with open(path, 'wb') as handle:
+            handle.write(rewind(file).read())
+        yield path
+
+
+def file_name(file):
+    """Ime datoteke za pot ali naloženo datoteko (st.file_uploader)."""
+    if isinstance(file, (str, os.PathLike)):
+        return str(file)
+    return getattr(file, "name", "")
+
+
+def rewind(file):
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    return file
+
+
+def detect_delimiter(file):
+    """Zazna ločilo iz prvih 1024 bajtov datoteke; privzeto vrne ';'."""
+    file.seek(0)
+    sample = file.read(1024)
+    file.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode('utf-8', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        # Sniffer ne zmore, ko je že glava daljša od vzorca; izberi najpogostejše ločilo v prvi vrstici
+        header = sample.splitlines()[0] if sample else ""
+        counts = {delimiter: header.count(delimiter) for delimiter in DELIMITERS}
+        best = max(counts, key=counts.get)
+        return best if counts[best] > 0 else ';'
+
+
+def file_delimiter(file):
+    """Zazna ločilo za pot ali odprt binarni objekt."""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            return detect_delimiter(handle)
+    return detect_delimiter(file)
+
+
+def read_columns(file, fmt=None, delimiter=None):
+    """Prebere samo imena stolpcev, brez dekodiranja podatkov."""
+    fmt = fmt or file_format(file_name(file))
+    if fmt == "parquet":
+        return pq.read_schema(rewind(file)).names
+    if fmt == "feather":
+        return ipc.open_file(rewind(file)).schema.names
+    if fmt in STATS_READERS:
+        with local_path(file, fmt) as path:
+            _, meta = STATS_READERS[fmt](path, metadataonly=True)
+        return list(meta.column_names)
+    delimiter = delimiter or file_delimiter(file)
+    return pd.read_csv(rewind(file), delimiter=delimiter, nrows=0).columns.tolist()
+
+
+def in_file_order(columns, all_columns):
+    """Vrne izbrane stolpce v vrstnem redu, kot so v datoteki."""
+    if columns is None:
+        return None
+    selected = set(columns)
+    return [column for column in all_columns if column in selected]
+
+
+def read_table(file, fmt=None, columns=None, delimiter=None):
+    """Prebere datoteko v DataFrame s tipi, podprtimi z Arrow.
+
+    Če je podan columns, se dekodirajo samo ti stolpci.
+    """
+    fmt = fmt or file_format(file_name(file))
+    if fmt == "parquet":
+        return pd.read_parquet(rewind(file), columns=columns, dtype_backend="pyarrow")
+    if fmt == "feather":
+        return pd.read_feather(rewind(file), columns=columns, dtype_backend="pyarrow")
+    if fmt in STATS_READERS:
+        with local_path(file, fmt) as path:
+            df, meta = STATS_READERS[fmt](path, usecols=columns)
+        df.attrs.update(stats_labels(meta))
+        return df
+    delimiter = delimiter or file_delimiter(file)
+    try:
+        return pd.read_csv(rewind(file), delimiter=delimiter, usecols=columns, engine="pyarrow", dtype_backend="pyarrow")
+    except (pa.ArrowInvalid, ValueError):
+        # Bralnik pyarrow je strožji od privzetega; pri nepravilnih vrsticah uporabimo privzetega
+        return pd.read_csv(rewind(file), delimiter=delimiter, usecols=columns, dtype_backend="pyarrow")
+
+
+def read_table_chunks(file, fmt=None, chunksize=DEFAULT_CHUNKSIZE, columns=None, delimiter=None):
+    """Vrne iterator po kosih datoteke z največ chunksize vrsticami."""
+    fmt = fmt or file_format(file_name(file))
+    if fmt == "parquet":
+        batches = pq.ParquetFile(rewind(file)).iter_batches(batch_size=chunksize, columns=columns)
+        return _batches_to_frames(batches)
+    if fmt == "feather":
+        reader = ipc.open_file(rewind(file))
+        batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        if columns is not None:
+            batches = (batch.select(columns) for batch in batches)
+        return _batches_to_frames(batches, chunksize)
+    if fmt in STATS_READERS:
+        return _stats_chunks(file, fmt, chunksize, columns)
+    delimiter = delimiter or file_delimiter(file)
+    return pd.read_csv(rewind(file), delimiter=delimiter, chunksize=chunksize, usecols=columns, dtype_backend="pyarrow")
+
+
+def _batches_to_frames(batches, chunksize=None):
+    offset = 0
+    for batch in batches:
+        step = chunksize or max(batch.num_rows, 1)
+        for start in range(0, batch.num_rows, step):
+            frame = batch.slice(start, step).to_pandas(types_mapper=pd.ArrowDtype)
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            offset += len(frame)
+            yield frame
+
+
+def _stats_chunks(file, fmt, chunksize, columns):
+    with local_path(file, fmt) as path:
+        chunks = pyreadstat.read_file_in_chunks(STATS_READERS[fmt], path, chunksize=chunksize, usecols=columns)
+        offset = 0
+        for chunk, _ in chunks:
+            # pyreadstat vsak kos indeksira od 0
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+
+def column_types(file, fmt=None, columns=None):
+    """Tipi Arrow stolpcev, ki so določeni že v datoteki: {stolpec: pa.DataType}.
+
+    Parquet in Feather imata tipe v shemi. V SPSS/Stata je številski stolpec
+    float64, besedilni ter datumski in časovni pa niz (kos brez vrednosti ima
+    pri njih tip object). V CSV se tipi ugibajo za vsak kos posebej, zato
+    vrne prazen slovar. Če je podan columns, vrne samo te stolpce.
+    """
+    fmt = fmt or file_format(file_name(file))
+    if fmt == "parquet":
+        schema = pq.read_schema(rewind(file))
+    elif fmt == "feather":
+        schema = ipc.open_file(rewind(file)).schema
+    elif fmt in STATS_READERS:
+        with local_path(file, fmt) as path:
+            _, meta = STATS_READERS[fmt](path, metadataonly=True)
+        fields = []
+        for column, kind in meta.readstat_variable_types.items():
+            date = STATS_DATE_FORMATS.match(meta.original_variable_types.get(column) or "")
+            fields.append((column, pa.float64() if kind == "double" and not date else pa.string()))
+        schema = pa.schema(fields)
+    else:
+        return {}
+    selected = None if columns is None else set(columns)
+    return {field.name: field.type for field in schema if selected is None or field.name in selected}
+
+
+def unique_values(file, columns, fmt=None, chunksize=DEFAULT_CHUNKSIZE, delimiter=None):
+    """Po kosih zbere unikatne neprazne vrednosti izbranih stolpcev."""
+    values = set()
+    for chunk in read_table_chunks(file, fmt, chunksize, columns=columns, delimiter=delimiter):
+        for column in columns:
+            values.update(str(value).strip() for value in chunk[column].dropna().unique())
+    values.discard("")
+    return values
+
+
+def stats_labels(meta):
+    """Oznake spremenljivk in vrednosti iz metapodatkov pyreadstat, za DataFrame.attrs.
+
+    write_table jih pri zapisu v .sav ali .dta zapiše nazaj.
+    """
+    return {
+        "column_labels": {column: label for column, label in meta.column_names_to_labels.items() if label},
+        "value_labels": dict(meta.variable_value_labels),
+    }
+
+
+def _stats_name(column):
+    # ASCII črke (šumniki brez strešic), številke in '_', na začetku črka
+    name = unicodedata.normalize("NFKD", str(column)).encode("ascii", "ignore").decode()
+    name = re.sub(r"[^A-Za-z0-9_]", "_", name)
+    if not name[:1].isalpha():
+        name = "v" + name
+    if name.lower() in STATS_RESERVED:
+        name += "_"
+    return name
+
+
+def stats_names(columns, fmt):
+    """Imena spremenljivk SPSS/Stata za stolpce: {stolpec: ime}.
+
+    Veljavna imena ostanejo enaka, ostala se prilagodijo (_stats_name) in
+    skrajšajo na največjo dolžino oblike. Imena so edinstvena ne glede na
+    velike in male črke; ob sovpadanju dobijo pripono _2, _3 ...
+    """
+    limit = STATS_NAME_LIMITS[fmt]
+    proposed = {column: _stats_name(column)[:limit] for column in columns}
+    names = {}
+    used = set()
+    # Stolpci z veljavnimi imeni najprej, da jim prilagojeno ime ne vzame imena
+    for column in sorted(columns, key=lambda column: proposed[column] != column):
+        name, number = proposed[column], 1
+        while name.lower() in used:
+            number += 1
+            suffix = f"_{number}"
+            name = proposed[column][:limit - len(suffix)] + suffix
+        used.add(name.lower())
+        names[column] = name
+    return {column: names[column] for column in columns}
+
+
+def to_stats_frame(df, value_labels=None):
+    """Pretvori DataFrame v tipe, ki jih zna zapisati pyreadstat.
+
+    Stolpci z oznakami vrednosti (npr. <stolpec>R) postanejo številski, ostali
+    Arrow tipi pa float (številke), datetime64 (datumi in časi) ali object
+    (besedilo). Datumi in časi, ki jih je prebral pyreadstat, ostanejo taki.
+    """
+    value_labels = value_labels or {}
+    converted = {}
+    for column in df.columns:
+        values = df[column]
+        if column in value_labels or pd.api.types.is_numeric_dtype(values.dtype):
+            converted[column] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif pd.api.types.is_bool_dtype(values.dtype):
+            converted[column] = values.astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+            if values.dt.tz is not None:
+                values = values.dt.tz_localize(None)
+            converted[column] = values.astype("datetime64[ns]")
+        elif pd.api.types.infer_dtype(values, skipna=True) in ("date", "time", "datetime"):
+            converted[column] = values
+        else:
+            converted[column] = values.astype(object).where(values.notna(), "").astype(str)
+    return pd.DataFrame(converted, index=df.index)
+
+
+def write_table(df, path, fmt=None, value_labels=None):
+    """Zapiše DataFrame v CSV (ločilo ';'), Parquet, Feather, SPSS (.sav) ali Stata (.dta).
+
+    value_labels ({stolpec: {koda: oznaka}}) se upošteva samo pri .sav in .dta,
+    skupaj z oznakami iz df.attrs (stats_labels), ki jih value_labels
+    povozi. Imena stolpcev se prilagodijo obliki (stats_names); izvirno ime
+    postane oznaka spremenljivke, če ta še nima svoje.
+    """
+    fmt = fmt or file_format(path)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    elif fmt in STATS_WRITERS:
+        value_labels = {
+            column: labels
+            for column, labels in {**df.attrs.get("value_labels", {}), **(value_labels or {})}.items()
+            if column in df.columns
+        }
+        stats_df = to_stats_frame(df, value_labels)
+        names = stats_names(df.columns, fmt)
+        column_labels = df.attrs.get("column_labels", {})
+        variable_labels = [column_labels.get(column) or (column if names[column] != column else None) for column in df.columns]
+        limit = STATS_LABEL_LIMITS[fmt]
+        STATS_WRITERS[fmt](
+            stats_df.rename(columns=names),
+            path,
+            column_labels=[label if label is None or limit is None else label[:limit] for label in variable_labels],
+            variable_value_labels={names[column]: labels for column, labels in value_labels.items()} or None,
+        )
+    else:
+        df.to_csv(path, index=False, sep=';', encoding='utf-8')
+
+
+def _to_arrow(values, data_type):
+    """Stolpec kosa kot polje Arrow tipa data_type."""
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Stolpec object z mešanimi tipi (npr. številke in besedilo)
+        array = pa.array(values.astype(object).where(values.isna(), values.astype(str)), from_pandas=True)
+    return array.cast(data_type)
+
+
+class TableWriter:
+    """Sproti zapisuje kose DataFrame-a v eno datoteko (CSV, Parquet ali Feather).
+
+    Sheme Parquet in Feather po začetku zapisa ni mogoče spremeniti, zato
+    tipi ne smejo biti odvisni od prvega kosa: stolpci iz column_types (npr.
+    column_types() vhodne datoteke) dobijo svoj tip, vsi ostali (stolpci CSV,
+    ujemanja, identifikatorji) pa so nizi. Vsak kos se pretvori v to shemo,
+    zato tipi, ki jih pandas ugane za posamezen kos, ne vplivajo na izhod.
+    """
+
+    def __init__(self, path, fmt=None, column_types=None):
+        self.path = path
+        self.fmt = fmt or file_format(path)
+        if self.fmt not in STREAM_FORMATS:
+            raise ValueError(f"Zapis po kosih ni podprt za obliko '{self.fmt}'.")
+        self.column_types = column_types or {}
+        self._output = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if self.fmt == "csv":
+            header = self._output is None
+            if header:
+                self._output = open(self.path, 'w', newline='', encoding='utf-8')
+            df.to_csv(self._output, index=False, sep=';', header=header)
+            return
+
+        if self._schema is None:
+            self._schema = pa.schema([
+                (str(column), self.column_types.get(column, pa.string())) for column in df.columns
+            ])
+        table = pa.Table.from_arrays(
+            [_to_arrow(df[field.name], field.type) for field in self._schema], schema=self._schema
+        )
+        if self._writer is None:
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = ipc.new_file(self.path, self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._output is not None:
+            self._output.close()
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
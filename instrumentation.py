@@ -0,0 +1,127 @@
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+
+import psutil
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+logger = logging.getLogger("instrumentation")
+
+# Kako pogosto (v sekundah) se med korakom preveri poraba pomnilnika procesa
+MEMORY_INTERVAL = 0.01
+
+# Število najdražjih funkcij v poročilu cProfile
+PROFILE_LINES = 30
+
+MEGABYTE = 1024 * 1024
+
+
+class PeakMemory:
+    """Največja poraba pomnilnika procesa (RSS) med izvajanjem bloka with.
+
+    Vzorči se v ločeni niti, zato se šteje tudi pomnilnik, ki ga zasedejo
+    numpy, Arrow in RapidFuzz mimo Pythonovega alokatorja.
+    """
+
+    def __init__(self, interval=MEMORY_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start = self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.end = self.process.memory_info().rss
+        self.peak = max(self.peak, self.end)
+
+
+class StageRecorder:
+    """Meritve korakov obdelave: čas, vrstice, različne vrednosti, zadetki predpomnilnika in pomnilnik.
+
+    Vsak korak se zapiše v records in v dnevnik kot ena vrstica JSON. Če je
+    podan limit, se v records ohrani samo toliko zadnjih meritev.
+    """
+
+    def __init__(self, records=None, limit=None):
+        self.records = records if records is not None else []
+        self.limit = limit
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        """Izmeri blok with kot korak name.
+
+        Vrne slovar meritve, v katerega lahko blok doda svoja polja (npr.
+        vrstice, vrednosti, predpomnilnik); fields so začetna polja.
+        """
+        record = {"korak": name, **fields}
+        start = time.perf_counter()
+        try:
+            with PeakMemory() as memory:
+                yield record
+        except BaseException:
+            record["napaka"] = True
+            raise
+        finally:
+            record["cas_s"] = round(time.perf_counter() - start, 4)
+            record["pomnilnik_mb"] = round(memory.end / MEGABYTE, 1)
+            record["vrh_pomnilnika_mb"] = round(memory.peak / MEGABYTE, 1)
+            record["prirastek_mb"] = round((memory.peak - memory.start) / MEGABYTE, 1)
+            self.records.append(record)
+            if self.limit is not None:
+                del self.records[:-self.limit]
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def match_record(record, stats):
+    """Doda meritvi klasifikacije število vrstic po viru ujemanja iz stats (match_columns)."""
+    record.update({source: int(count) for source, count in stats.items()})
+    return record
+
+
+@contextlib.contextmanager
+def profiled():
+    """Profilira blok with; po koncu vsebuje vrnjeni slovar poročilo kot besedilo ("porocilo").
+
+    Uporabi pyinstrument, če je nameščen, sicer cProfile (najdražje funkcije
+    po skupnem času).
+    """
+    result = {"orodje": "pyinstrument" if pyinstrument is not None else "cProfile"}
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            result["porocilo"] = profiler.output_text(unicode=True)
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        result["porocilo"] = output.getvalue()
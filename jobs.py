@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Toliko klasifikacij lahko teče hkrati; vsaka ocenjuje na vseh jedrih
+DEFAULT_WORKERS = 2
+
+# Končana opravila, ki jih nobena seja ne prevzame, se po toliko sekundah zavržejo
+FINISHED_TTL = 3600
+
+
+class JobCancelled(Exception):
+    """Opravilo je bilo preklicano (Job.cancel)."""
+
+
+class Job:
+    """Opravilo v ozadju z napredkom po stolpcih in možnostjo preklica.
+
+    report(stolpec, delež) je povratni klic za napredek (kot progress v
+    match_columns); po preklicu sproži JobCancelled, zato se opravilo konča
+    ob naslednjem sporočilu o napredku.
+    """
+
+    def __init__(self, key=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        # Število sej, ki čakajo na rezultat (JobManager.submit s key)
+        self.users = 1
+        self.progress = {}
+        self.future = None
+        self.finished = None
+        self._cancelled = threading.Event()
+
+    def _finish(self, future):
+        self.finished = time.monotonic()
+
+    def report(self, column, fraction):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        self.progress[column] = fraction
+
+    def fraction(self):
+        """Skupni delež opravljenega dela (povprečje po stolpcih)."""
+        if not self.progress:
+            return 0.0
+        return sum(self.progress.values()) / len(self.progress)
+
+    def cancel(self):
+        self._cancelled.set()
+        self.future.cancel()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """Rezultat opravila; sproži JobCancelled, če je bilo preklicano, ali izjemo iz opravila."""
+        if self.future.cancelled():
+            raise JobCancelled()
+        return self.future.result()
+
+
+class JobManager:
+    """Izvaja opravila v skupnem bazenu niti strežniškega procesa.
+
+    Seja hrani samo id opravila, zato opravilo teče naprej med ponovnimi
+    zagoni skripte in ga seja prevzame, ko je končano. Seje, ki oddajo
+    opravilo z enakim ključem, dobijo isto opravilo, zato se isto delo ne
+    izvaja večkrat hkrati.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="opravilo")
+        self._jobs = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, key=None, **kwargs):
+        """Zažene function(*args, progress=job.report, **kwargs) v ozadju in vrne Job.
+
+        Če že obstaja nepreklicano opravilo s ključem key, se vrne to
+        opravilo; rezultat si seje delijo, zato ga ne smejo spreminjati.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(self._keys.get(key)) if key is not None else None
+            if job is not None and not job.cancelled():
+                job.users += 1
+                return job
+            job = Job(key)
+            job.future = self._executor.submit(function, *args, progress=job.report, **kwargs)
+            job.future.add_done_callback(job._finish)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        """Seja ne potrebuje več opravila (rezultat je prevzet ali opuščen).
+
+        Ko ga ne potrebuje nobena seja več, se opravilo odstrani, nedokončano
+        pa tudi prekliče.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.users -= 1
+            if job.users > 0:
+                return
+            self._remove(job)
+        if not job.done():
+            job.cancel()
+
+    def _remove(self, job):
+        del self._jobs[job.id]
+        if job.key is not None and self._keys.get(job.key) == job.id:
+            del self._keys[job.key]
+
+    def _prune(self):
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.finished is not None and now - job.finished > FINISHED_TTL:
+                self._remove(job)
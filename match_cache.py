@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_PATH = os.path.join(".cache", "match_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 500000
+
+# SQLite dovoli največ 999 parametrov v eni poizvedbi
+BATCH_SIZE = 900
+
+
+def words_key(words, scorer="ratio", normalization=""):
+    """Vrne zgoščeno vrednost seznama besed, ocenjevalnika in normalizacije, ki določa ključ v predpomnilniku."""
+    return hashlib.sha1("\n".join([scorer, normalization] + list(words)).encode("utf-8")).hexdigest()
+
+
+class MatchCache:
+    """Trajni predpomnilnik ujemanj: (normalizirana vrednost, seznam besed, ocenjevalnik) -> (ujemanje, razmerje).
+
+    Prag podobnosti ni del ključa, zato se ob spremembi praga ponovno izračuna
+    samo za_pregled. Ko vnosov preseže max_entries, se izbrišejo najdlje neuporabljeni.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            " words_key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " best_match TEXT,"
+            " score REAL NOT NULL,"
+            " used REAL NOT NULL,"
+            " PRIMARY KEY (words_key, value))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS matches_used ON matches (used)")
+        self._connection.commit()
+
+    def lookup(self, key, values):
+        """Vrne slovar {vrednost: (ujemanje, razmerje)} za vrednosti, ki so že v predpomnilniku."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(values), BATCH_SIZE):
+                batch = list(values[start:start + BATCH_SIZE])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT value, best_match, score FROM matches WHERE words_key = ? AND value IN ({placeholders})",
+                    [key] + batch,
+                ).fetchall()
+                found.update((value, (best_match, score)) for value, best_match, score in rows)
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE matches SET used = ? WHERE words_key = ? AND value = ?",
+                    [(now, key, value) for value in found],
+                )
+                self._connection.commit()
+        return found
+
+    def store(self, key, matches):
+        """Shrani slovar {vrednost: (ujemanje, razmerje)} in po potrebi izbriše stare vnose."""
+        if not matches:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO matches (words_key, value, best_match, score, used) VALUES (?, ?, ?, ?, ?)",
+                [(key, value, best_match, float(score), now) for value, (best_match, score) in matches.items()],
+            )
+            self._evict()
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def _evict(self):
+        count = self._connection.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM matches WHERE rowid IN (SELECT rowid FROM matches ORDER BY used LIMIT ?)",
+                (count - self.max_entries,),
+            )
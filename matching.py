@@ -0,0 +1,499 @@
+import collections
+import functools
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Indel, JaroWinkler
+
+from match_cache import words_key
+from normalization import normalization_options, normalize_series, normalize_words, options_key
+
+
+# Koliko vrednosti naenkrat primerjamo z vsemi besedami (omeji velikost matrike)
+BLOCK_SIZE = 20000
+# Največje število celic matrike v enem bloku; pri dolgih seznamih besed je blok krajši
+MAX_BLOCK_CELLS = 20000000
+
+# Kandidati se najprej izberejo z indeksom (CandidateIndex) pri toliko besedah ali več in pragu
+# v tem razponu. Pri nižjem pragu meja izloči premalo besed, pri višjem pa ostane preveč vrednosti
+# brez ujemanja nad pragom, ki jih je treba oceniti še z vsemi besedami (bench_candidates.py).
+CANDIDATE_MIN_WORDS = 5000
+CANDIDATE_THRESHOLDS = (0.65, 0.8)
+
+# Ocenjevalniki, izbirni v use case-u (scorer): (funkcija, merilo ocene, ocenjevanje s pragom).
+# S pragom (score_cutoff) se oceni dvakrat: najprej s pragom, nato brez njega samo vrednosti
+# pod pragom. Splača se le, kjer knjižnica s pragom opazno skrajša izračun; pri ratio za
+# dolge sezname besed namesto tega skrajša izračun CandidateIndex.
+SCORERS = {
+    "ratio": (Indel.normalized_similarity, 1, False),
+    "token_set_ratio": (fuzz.token_set_ratio, 100, False),
+    "jaro_winkler": (JaroWinkler.normalized_similarity, 1, True),
+    "partial_ratio": (fuzz.partial_ratio, 100, False),
+}
+DEFAULT_SCORER = "ratio"
+
+# Načini, na katere je bila vrednost razrešena
+SOURCE_EMPTY = "prazno"
+SOURCE_EXACT = "tocno"
+SOURCE_CACHE = "predpomnilnik"
+SOURCE_FUZZY = "ocena"
+SOURCE_SPLIT = "razdeljeno"
+
+# Ločila, po katerih se razdeli celica z več odgovori ("telekom in a1", "Hot/hofer")
+DEFAULT_SEPARATORS = [",", ";", "/", "+", "&", " in ", " ali ", " and "]
+
+
+def scorer_for(name):
+    """Vrne (funkcija, merilo, ocenjevanje s pragom) za ime ocenjevalnika; neznano ime sproži ValueError."""
+    if name not in SCORERS:
+        raise ValueError(f"Neznan ocenjevalnik '{name}'. Na voljo: {', '.join(SCORERS)}.")
+    return SCORERS[name]
+
+
+def score_matrix(values, words, workers=-1, scorer=DEFAULT_SCORER, score_cutoff=None):
+    """Vrne matriko podobnosti (vrednosti x besede) med 0 in 1.
+
+    Vrednosti in besede morajo biti že normalizirane (normalization.py).
+    Privzeti ocenjevalnik ratio je enak Levenshtein.ratio. Ocene pod
+    score_cutoff (0-1) so 0, kar knjižnici omogoči, da izračun prej konča.
+    """
+    function, scale, _ = scorer_for(scorer)
+    scores = process.cdist(
+        values,
+        words,
+        scorer=function,
+        dtype=np.float64,
+        workers=workers,
+        score_cutoff=None if score_cutoff is None else score_cutoff * scale,
+    )
+    return scores / scale if scale != 1 else scores
+
+
+def block_size(words):
+    """Število vrednosti v enem bloku, da matrika (vrednosti x besede) ne preseže MAX_BLOCK_CELLS."""
+    return max(1, min(BLOCK_SIZE, MAX_BLOCK_CELLS // max(len(words), 1)))
+
+
+def char_tokens(text):
+    """Znaki besedila kot množica (znak, ponovitev): "ana" -> {(a, 0), (n, 0), (a, 1)}."""
+    seen = collections.Counter()
+    tokens = []
+    for char in text:
+        tokens.append((char, seen[char]))
+        seen[char] += 1
+    return tokens
+
+
+class CandidateIndex:
+    """Obrnjeni indeks znakov seznama besed za hitro izbiro kandidatov.
+
+    Indel.normalized_similarity je 2 * LCS / (la + lb), LCS pa ne more biti
+    večji od števila skupnih znakov (kot multimnožice). Beseda, pri kateri je
+    ta zgornja meja pod pragom, zato ne more biti nad pragom, in je ni treba
+    ocenjevati. Filter ne izpusti nobene besede nad pragom.
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.tokens = {}
+        positions = [
+            (self.tokens.setdefault(token, len(self.tokens)), position)
+            for position, word in enumerate(self.words)
+            for token in char_tokens(word)
+        ]
+        # Zadnja vrstica so dolžine besed, da se meja izračuna v istem množenju matrik
+        self.matrix = np.zeros((len(self.tokens) + 1, len(self.words)), dtype=np.float32)
+        if positions:
+            self.matrix[tuple(np.array(positions).T)] = 1
+        self.matrix[-1] = [len(word) for word in self.words]
+
+    def candidates(self, values, threshold):
+        """Vrne (indeksi vrednosti, indeksi besed) za pare, katerih zgornja meja je nad pragom.
+
+        Pogoj 2 * skupni / (la + lb) > prag se preveri kot
+        skupni - prag / 2 * lb > prag / 2 * la, z majhno rezervo za zaokroževanje.
+        """
+        positions = [
+            (position, self.tokens[token])
+            for position, value in enumerate(values)
+            for token in char_tokens(value)
+            if token in self.tokens
+        ]
+        value_tokens = np.zeros((len(values), len(self.tokens) + 1), dtype=np.float32)
+        if positions:
+            value_tokens[tuple(np.array(positions).T)] = 1
+        value_tokens[:, -1] = -threshold / 2
+        margin = value_tokens @ self.matrix
+        limits = np.array([len(value) for value in values], dtype=np.float32) * (threshold / 2) - 1e-3
+        return np.nonzero(margin > limits[:, None])
+
+
+@functools.lru_cache(maxsize=16)
+def candidate_index(words):
+    """CandidateIndex za tuple besed; zgradi se enkrat na seznam besed."""
+    return CandidateIndex(words)
+
+
+def best_candidates(values, index, threshold, workers=-1):
+    """Kot best_matches, vendar oceni samo kandidate iz indeksa.
+
+    Vrne (indeks, razmerje, najdeno): najdeno je True, kjer je najboljši
+    kandidat nad pragom. Takrat je rezultat enak izčrpnemu iskanju (tudi pri
+    izenačenju zmaga prva beseda), ostale vrednosti je treba oceniti z vsemi
+    besedami.
+    """
+    best_index = np.full(len(values), -1, dtype=np.int64)
+    best_score = np.zeros(len(values), dtype=np.float64)
+    value_positions, word_positions = index.candidates(values, threshold)
+    if len(value_positions):
+        scores = process.cpdist(
+            [values[position] for position in value_positions],
+            [index.words[position] for position in word_positions],
+            scorer=Indel.normalized_similarity,
+            dtype=np.float64,
+            workers=workers,
+        )
+        # Po vrednosti, nato po padajočem razmerju in naraščajočem indeksu besede
+        order = np.lexsort((word_positions, -scores, value_positions))
+        first = order[np.unique(value_positions[order], return_index=True)[1]]
+        best_index[value_positions[first]] = word_positions[first]
+        best_score[value_positions[first]] = scores[first]
+    return best_index, best_score, best_score > threshold
+
+
+def use_candidates(words, threshold, scorer=DEFAULT_SCORER):
+    """Ali se pri teh besedah, pragu in ocenjevalniku splača izbira kandidatov s CandidateIndex."""
+    if threshold is None or scorer != DEFAULT_SCORER or len(words) < CANDIDATE_MIN_WORDS:
+        return False
+    low, high = CANDIDATE_THRESHOLDS
+    return low <= round(threshold, 6) <= high
+
+
+def best_matches(values, words, workers=-1, threshold=None, scorer=DEFAULT_SCORER, candidates=None):
+    """Za vsako vrednost vrne indeks najboljše besede in njeno razmerje.
+
+    Če nobena beseda ni podobna (razmerje 0), je indeks -1. Vrednost, ki je
+    enaka besedi (brez razlike v velikosti črk), dobi to besedo z razmerjem 1
+    brez ocenjevanja. Če je podan prag, se najprej ocenjuje s score_cutoff:
+    kjer se splača, le kandidati iz CandidateIndex (use_candidates; candidates
+    izbiro vsili), sicer pri ocenjevalnikih, ki jim prag koristi. Z vsemi
+    besedami in brez meje se ponovno ocenijo samo vrednosti brez ujemanja nad
+    pragom, da dobijo predlog za pregled. Rezultat je enak kot brez praga.
+    """
+    best_index = np.full(len(values), -1, dtype=np.int64)
+    best_score = np.zeros(len(values), dtype=np.float64)
+    if len(values) == 0 or len(words) == 0:
+        return best_index, best_score
+
+    # Točno ujemanje: prva beseda z enakim zapisom, ostalih besed ni treba ocenjevati
+    word_positions = {}
+    for position, word in enumerate(words):
+        word_positions.setdefault(word, position)
+    exact = np.array([word_positions.get(value, -1) for value in values], dtype=np.int64)
+    best_index[exact >= 0] = exact[exact >= 0]
+    best_score[exact >= 0] = 1.0
+    remaining = np.flatnonzero(exact < 0)
+
+    if candidates is None:
+        candidates = use_candidates(words, threshold, scorer)
+    if candidates:
+        index = candidate_index(tuple(words))
+        found_all = np.zeros(len(remaining), dtype=bool)
+        for start in range(0, len(remaining), block_size(words)):
+            positions = remaining[start:start + block_size(words)]
+            index_block, score_block, found = best_candidates(
+                [values[position] for position in positions], index, threshold, workers=workers
+            )
+            best_index[positions] = index_block
+            best_score[positions] = score_block
+            found_all[start:start + len(positions)] = found
+        remaining = remaining[~found_all]
+    elif threshold is not None and scorer_for(scorer)[2]:
+        remaining = _score_blocks(values, words, remaining, best_index, best_score, workers, scorer, threshold)
+
+    _score_blocks(values, words, remaining, best_index, best_score, workers, scorer)
+    return best_index, best_score
+
+
+def _score_blocks(values, words, positions, best_index, best_score, workers, scorer, score_cutoff=None):
+    """Oceni vrednosti na positions z vsemi besedami in zapiše najboljše v best_index in best_score.
+
+    S score_cutoff so ocene pod pragom 0; vrne pozicije brez ujemanja nad
+    pragom, ki jih je treba oceniti ponovno brez meje.
+    """
+    unresolved = []
+    for start in range(0, len(positions), block_size(words)):
+        block_positions = positions[start:start + block_size(words)]
+        scores = score_matrix(
+            [values[position] for position in block_positions], words,
+            workers=workers, scorer=scorer, score_cutoff=score_cutoff,
+        )
+        # argmax vrne prvo najboljšo besedo, tako kot stroga primerjava v zanki
+        index = scores.argmax(axis=1)
+        score = scores[np.arange(len(block_positions)), index]
+        if score_cutoff is not None:
+            # Nad pragom je rezultat enak kot brez meje, saj so vse besede nad pragom ocenjene
+            resolved = score > score_cutoff
+            unresolved.append(block_positions[~resolved])
+            block_positions, index, score = block_positions[resolved], index[resolved], score[resolved]
+        best_index[block_positions] = np.where(score > 0, index, -1)
+        best_score[block_positions] = score
+    return np.concatenate(unresolved) if unresolved else np.array([], dtype=np.int64)
+
+
+def review_flags(scores, threshold):
+    """Vrednosti z razmerjem nad pragom so sprejete, ostale gredo v pregled."""
+    return ~(np.asarray(scores, dtype=np.float64) > threshold)
+
+
+def build_result(matches, scores, threshold, index, all_matches=None):
+    """Sestavi DataFrame s stolpci najboljse_ujemanje, razmerje in za_pregled.
+
+    Vrednosti brez ocene (razmerje NaN) ostanejo prazne. Če je podan
+    all_matches, se doda stolpec vsa_ujemanja (tuple ujemanj ali None).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    scored = ~np.isnan(scores)
+    result = pd.DataFrame(index=index)
+    result['najboljse_ujemanje'] = pd.Series(None, index=index, dtype=object)
+    result['razmerje'] = pd.Series(None, index=index, dtype=object)
+    result['za_pregled'] = pd.Series(None, index=index, dtype=object)
+    result.loc[scored, 'najboljse_ujemanje'] = np.asarray(matches, dtype=object)[scored]
+    result.loc[scored, 'razmerje'] = scores[scored]
+    result.loc[scored, 'za_pregled'] = review_flags(scores[scored], threshold)
+    if all_matches is not None:
+        result['vsa_ujemanja'] = pd.Series(all_matches, index=index, dtype=object)
+    return result
+
+
+def split_value(value, separators):
+    """Razdeli vrednost po ločilih na neprazne dele brez presledkov na robovih."""
+    pattern = "|".join(re.escape(separator) for separator in separators)
+    return [part.strip() for part in re.split(pattern, value) if part.strip()]
+
+
+def split_matches(values, matches, scores, sources, words, threshold, separators, stats=None, **score_options):
+    """Razreši vrednosti z več odgovori v eni celici.
+
+    Vrednosti, ki se ne ujemajo točno (razmerje pod 1), se razdelijo po
+    separators; vsi
+    deli vseh takih vrednosti se ocenijo naenkrat (score_values s
+    score_options). Če je vsak del nad pragom, vrednost dobi ujemanje prvega
+    dela, najmanjše razmerje delov in vir razdeljeno; matches, scores in
+    sources se spremenijo na mestu. Vrne polje vsa_ujemanja: tuple različnih
+    ujemanj za vsako vrednost (None, kjer ujemanja ni). Če je podan stats, se
+    v ocenjene_vrednosti prišteje število mehko ocenjenih delov.
+    """
+    all_matches = np.array([None if match is None else (match,) for match in matches], dtype=object)
+    candidates = {}
+    for position, value in enumerate(values):
+        if sources[position] != SOURCE_EMPTY and scores[position] < 1:
+            parts = split_value(value, separators)
+            if len(parts) > 1:
+                candidates[position] = parts
+    if not candidates:
+        return all_matches
+
+    fragments = list(dict.fromkeys(part for parts in candidates.values() for part in parts))
+    fragment_matches, fragment_scores, fragment_sources = score_values(
+        fragments, words, threshold=threshold, **score_options
+    )
+    if stats is not None:
+        stats["ocenjene_vrednosti"] += int((fragment_sources == SOURCE_FUZZY).sum())
+    fragment_results = dict(zip(fragments, zip(fragment_matches, fragment_scores)))
+    for position, parts in candidates.items():
+        results = [fragment_results[part] for part in parts]
+        if all(score > threshold for _, score in results):
+            matches[position] = results[0][0]
+            scores[position] = min(score for _, score in results)
+            sources[position] = SOURCE_SPLIT
+            all_matches[position] = tuple(dict.fromkeys(match for match, _ in results))
+    return all_matches
+
+
+def score_values(values, words, cache=None, exact_index=None, workers=-1, threshold=None, scorer=DEFAULT_SCORER,
+                 normalization=None):
+    """Oceni seznam vrednosti in vrne (ujemanja, razmerja, viri) kot numpy polja.
+
+    Vir pove, kako je bila vrednost razrešena: prazno, tocno (indeks točnih
+    ujemanj), predpomnilnik ali ocena (mehko ocenjevanje). Prazne vrednosti
+    dobijo razmerje NaN. Mehko se ocenijo samo vrednosti, ki niso razrešene
+    prej z ocenjevalnikom scorer (SCORERS). Če je podan threshold, se
+    uporabi kot score_cutoff (best_matches).
+
+    Vrednosti morajo biti normalizirane z istimi možnostmi normalization;
+    besede se normalizirajo enkrat na seznam (normalize_words), ujemanja pa
+    se vrnejo v izvirnem zapisu besed.
+    """
+    words = list(words)
+    normalization = normalization_options(normalization)
+    normalized_words = list(normalize_words(tuple(words), normalization))
+    matches = np.full(len(values), None, dtype=object)
+    scores = np.full(len(values), np.nan, dtype=np.float64)
+    sources = np.full(len(values), SOURCE_EMPTY, dtype=object)
+
+    to_score = [position for position, value in enumerate(values) if isinstance(value, str) and value.strip() != ""]
+    if exact_index:
+        for position in to_score:
+            word = exact_index.get(values[position])
+            if word is not None:
+                matches[position], scores[position], sources[position] = word, 1.0, SOURCE_EXACT
+        to_score = [position for position in to_score if sources[position] != SOURCE_EXACT]
+
+    if cache is not None and to_score:
+        key = words_key(words, scorer, options_key(normalization))
+        cached = cache.lookup(key, [values[position] for position in to_score])
+        for position in to_score:
+            if values[position] in cached:
+                matches[position], scores[position] = cached[values[position]]
+                sources[position] = SOURCE_CACHE
+        to_score = [position for position in to_score if values[position] not in cached]
+
+    if to_score:
+        # Zadnji element je None, zato indeks -1 (brez ujemanja) vrne None
+        words_array = np.array(words + [None], dtype=object)
+        best_index, best_score = best_matches(
+            [values[position] for position in to_score], normalized_words,
+            workers=workers, threshold=threshold, scorer=scorer,
+        )
+        matches[to_score] = words_array[best_index]
+        scores[to_score] = best_score
+        sources[to_score] = SOURCE_FUZZY
+        if cache is not None:
+            cache.store(key, {values[position]: (matches[position], scores[position]) for position in to_score})
+    return matches, scores, sources
+
+
+def match_values(values, words, threshold, cache=None, exact_index=None, workers=-1, scorer=DEFAULT_SCORER,
+                 normalization=None):
+    """Poišče najboljše ujemanje za vse vrednosti naenkrat.
+
+    Vrne DataFrame s stolpci najboljse_ujemanje, razmerje in za_pregled
+    z istim indeksom kot vhodna serija.
+    """
+    values = pd.Series(values)
+    matches, scores, _ = score_values(
+        normalize_values(values, normalization).tolist(), words, cache=cache, exact_index=exact_index,
+        workers=workers, threshold=threshold, scorer=scorer, normalization=normalization,
+    )
+    return build_result(matches, scores, threshold, values.index)
+
+
+def apply_threshold(processed_df, threshold):
+    """Ponovno izračuna za_pregled iz shranjenih razmerij, brez ponovnega ocenjevanja."""
+    scored = processed_df['razmerje'].notna()
+    processed_df.loc[scored, 'za_pregled'] = review_flags(processed_df.loc[scored, 'razmerje'], threshold)
+    return processed_df
+
+
+def normalize_values(values, normalization=None):
+    """Pripravi vrednosti serije za primerjavo (normalization.py); manjkajoče postanejo prazne.
+
+    Vsaka različna vrednost se normalizira samo enkrat (pd.factorize),
+    rezultat pa se prek kod preslika nazaj v vrstice.
+    """
+    codes, uniques = pd.factorize(values)
+    # Zadnji element je za manjkajoče vrednosti (koda -1)
+    normalized = np.append(normalize_series(pd.Series(uniques, dtype=object), normalization).to_numpy(), "")
+    return pd.Series(normalized[codes], index=values.index, dtype=object)
+
+
+def worker_count(workers):
+    """Število niti za workers, kot ga razume rapidfuzz (-1 pomeni vsa jedra)."""
+    if workers == -1:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def match_columns(df, columns, words, threshold, cache=None, exact_index=None, stats=None, progress=None, workers=-1,
+                  scorer=DEFAULT_SCORER, separators=None, normalization=None):
+    """Klasificira več stolpcev hkrati, vsako različno vrednost pa oceni samo enkrat.
+
+    Stolpci se vzporedno zakodirajo (pd.factorize), normalizirajo se samo
+    njihove unikatne vrednosti, ki se združijo v skupen slovar. Unikatne
+    normalizirane vrednosti se ocenijo na vseh jedrih,
+    rezultati pa se vzporedno preslikajo nazaj v vrstice prek kod. Vsak stolpec
+    dobi svoj DataFrame s stolpci [stolpec, najboljse_ujemanje, razmerje,
+    za_pregled]; vhodni df ostane nespremenjen. Če so podani separators, se
+    vrednosti z več odgovori razdelijo (split_matches); stolpec vsa_ujemanja
+    dobijo samo stolpci, v katerih je bila razdeljena vsaj ena celica.
+
+    Unikatne vrednosti se ocenjujejo v blokih po BLOCK_SIZE, po vsakem bloku
+    se sporoči napredek.
+
+    Če je podan stats (npr. collections.Counter), se vanj prišteje število
+    vrstic, razrešenih po posameznem viru, ter število različnih vrednosti
+    (razlicne_vrednosti) in mehko ocenjenih vrednosti ter delov razdeljenih
+    celic (ocenjene_vrednosti). Če je podan progress, se kliče kot
+    progress(stolpec, delež) iz klicoče niti; izjema iz progress (npr. ob
+    preklicu) prekine klasifikacijo.
+    """
+    def report(column, fraction):
+        if progress is not None:
+            progress(column, fraction)
+
+    with ThreadPoolExecutor(max_workers=min(worker_count(workers), max(len(columns), 1))) as executor:
+        # Vsak stolpec najprej posebej zakodiramo po surovih vrednostih
+        futures = {executor.submit(pd.factorize, df[column]): position for position, column in enumerate(columns)}
+        factorized = [None] * len(columns)
+        for future in as_completed(futures):
+            factorized[futures[future]] = future.result()
+            report(columns[futures[future]], 1 / 3)
+
+        # Normaliziramo samo surove unikatne vrednosti vseh stolpcev, zadnja je za manjkajoče (koda -1)
+        raw_uniques = [value for _, column_uniques in factorized for value in column_uniques] + [""]
+        offsets = np.cumsum([0] + [len(column_uniques) for _, column_uniques in factorized])
+        unique_codes, uniques = pd.factorize(normalize_values(pd.Series(raw_uniques, dtype=object), normalization))
+        codes = np.concatenate([
+            unique_codes[np.where(column_codes >= 0, column_codes + offsets[position], len(raw_uniques) - 1)]
+            for position, (column_codes, _) in enumerate(factorized)
+        ]) if columns else np.array([], dtype=np.int64)
+        uniques = list(uniques)
+        scored = []
+        for start in range(0, len(uniques), BLOCK_SIZE):
+            scored.append(score_values(
+                uniques[start:start + BLOCK_SIZE], words, cache=cache, exact_index=exact_index, workers=workers,
+                threshold=threshold, scorer=scorer, normalization=normalization,
+            ))
+            done = min(start + BLOCK_SIZE, len(uniques)) / len(uniques)
+            for column in columns:
+                report(column, (1 + done) / 3)
+        matches, scores, sources = (np.concatenate(parts) for parts in zip(*scored))
+        if stats is not None:
+            # Pred split_matches, ki vir razdeljenih vrednosti spremeni v razdeljeno
+            stats["ocenjene_vrednosti"] += int((sources == SOURCE_FUZZY).sum())
+        all_matches = split_matches(
+            uniques, matches, scores, sources, words, threshold, separators, stats=stats,
+            cache=cache, exact_index=exact_index, workers=workers, scorer=scorer, normalization=normalization,
+        ) if separators else None
+        lookup = build_result(matches, scores, threshold, pd.RangeIndex(len(uniques)), all_matches)
+        for column in columns:
+            report(column, 2 / 3)
+
+        if stats is not None:
+            # Število vrstic po viru: koliko kod kaže na posamezno unikatno vrednost
+            row_counts = np.bincount(codes, minlength=len(uniques))
+            for source in (SOURCE_EMPTY, SOURCE_EXACT, SOURCE_CACHE, SOURCE_FUZZY, SOURCE_SPLIT):
+                stats[source] += int(row_counts[sources == source].sum())
+            # Mesto za manjkajoče (prazen niz) se šteje samo, če nanj kaže katera vrstica
+            stats["razlicne_vrednosti"] += int((row_counts > 0).sum())
+
+        split = sources == SOURCE_SPLIT
+
+        def column_result(position):
+            column_codes = codes[position * len(df):(position + 1) * len(df)]
+            column_matches = lookup.iloc[column_codes].set_axis(df.index)
+            if all_matches is not None and not split[column_codes].any():
+                column_matches = column_matches.drop(columns='vsa_ujemanja')
+            return pd.concat([df[[columns[position]]], column_matches], axis=1)
+
+        futures = {executor.submit(column_result, position): position for position in range(len(columns))}
+        results = [None] * len(columns)
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            report(columns[futures[future]], 1.0)
+    return results
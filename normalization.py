@@ -0,0 +1,75 @@
+import functools
+import re
+import unicodedata
+
+import pandas as pd
+
+
+# Privzeti koraki normalizacije; use case jih lahko spremeni z "normalization" v use_cases.yaml
+DEFAULT_OPTIONS = {
+    "nfkc": True,
+    "casefold": True,
+    "strip_diacritics": False,
+    "collapse_whitespace": True,
+    "strip_punctuation": False,
+}
+
+COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+WHITESPACE = re.compile(r"\s+")
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalization_options(options=None):
+    """Vrne vse možnosti normalizacije kot urejen tuple parov (uporaben kot ključ).
+
+    options je slovar (npr. usecase.get("normalization")) ali že tak tuple;
+    manjkajoče možnosti dobijo privzeto vrednost. Neznana možnost sproži
+    ValueError.
+    """
+    options = dict(options or {})
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Neznane možnosti normalizacije: {', '.join(sorted(unknown))}.")
+    return tuple(sorted({**DEFAULT_OPTIONS, **options}.items()))
+
+
+def options_key(options=None):
+    """Kratek niz možnosti za ključ v predpomnilniku ujemanj."""
+    return ",".join(name for name, enabled in normalization_options(options) if enabled)
+
+
+def normalize_text(text, options=None):
+    """Normalizira eno besedilo: NFKC, casefold, brez naglasov, enojni presledki (glede na options)."""
+    options = dict(normalization_options(options))
+    if options["nfkc"]:
+        text = unicodedata.normalize("NFKC", text)
+    if options["casefold"]:
+        text = text.casefold()
+    if options["strip_diacritics"]:
+        text = unicodedata.normalize("NFC", COMBINING_MARKS.sub("", unicodedata.normalize("NFD", text)))
+    if options["strip_punctuation"]:
+        text = PUNCTUATION.sub("", text)
+    if options["collapse_whitespace"]:
+        text = WHITESPACE.sub(" ", text)
+    return text.strip()
+
+
+def normalize_series(values, options=None):
+    """Kot normalize_text za celo serijo; manjkajoče vrednosti postanejo prazni nizi.
+
+    Klicati jo je smiselno na unikatnih vrednostih, da se vsaka normalizira
+    enkrat. Uporablja isti normalize_text kot posamezne vrednosti, da so
+    ključi povsod enaki (regularni izrazi v pyarrow drugače obravnavajo \\w in \\s).
+    """
+    options = normalization_options(options)
+    values = values.astype(object)
+    missing = values.isna()
+    result = pd.Series("", index=values.index, dtype=object)
+    result[~missing] = values[~missing].map(lambda value: normalize_text(str(value), options))
+    return result
+
+
+@functools.lru_cache(maxsize=64)
+def normalize_words(words, options=None):
+    """Normalizirane besede za tuple words; izračuna se enkrat na seznam besed in možnosti."""
+    return tuple(normalize_text(word, options) for word in words)
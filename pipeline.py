@@ -0,0 +1,417 @@
+import argparse
+import collections
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from config_store import load_config
+from datafiles import (
+    DEFAULT_CHUNKSIZE, EXPORT_FORMATS, TableWriter, column_types, file_format, file_name, read_columns, read_table,
+    read_table_chunks, write_table,
+)
+from instrumentation import StageRecorder, match_record, profiled
+from match_cache import MatchCache
+from matching import DEFAULT_SCORER, DEFAULT_SEPARATORS, match_columns, normalize_values
+from normalization import normalize_text
+from rules import RuleSet, build_exact_index
+
+
+DEFAULT_THRESHOLD = 0.7
+
+
+def split_names(text):
+    """Razdeli z vejicami ločen seznam (columns, recomenders) in odstrani prazne vnose."""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+def classify(df, columns, words, threshold, usecase, cache=None, exact_index=None, stats=None, progress=None,
+             workers=-1):
+    """Tab 2: klasificira stolpce in vrne seznam rezultatov, razvrščenih po za_pregled.
+
+    Ocenjevalnik je iz use case-a (scorer), privzeto ratio. Celice z več
+    odgovori se razdelijo po ločilih iz use case-a (separators, privzeto
+    DEFAULT_SEPARATORS; prazen seznam razdeljevanje izklopi); stolpec
+    vsa_ujemanja dobijo samo rezultati z vsaj eno razdeljeno celico. Vrednosti
+    in besede se primerjajo po normalizaciji iz use case-a (normalization).
+    """
+    if exact_index is None:
+        exact_index = build_exact_index(usecase, words)
+    processed_dfs = match_columns(
+        df, columns, words, threshold,
+        cache=cache,
+        exact_index=exact_index,
+        stats=stats,
+        progress=progress,
+        workers=workers,
+        scorer=usecase.get("scorer", DEFAULT_SCORER),
+        separators=usecase.get("separators", DEFAULT_SEPARATORS),
+        normalization=usecase.get("normalization"),
+    )
+    for processed_df in processed_dfs:
+        processed_df.sort_values(by="za_pregled", ascending=False, inplace=True)
+    return processed_dfs
+
+
+def review_keys(processed_df, column, normalization=None):
+    """Normalizirane vrednosti stolpca, po katerih se združujejo ročne odločitve.
+
+    Vsaka različna vrednost stolpca se normalizira enkrat (normalize_values).
+    """
+    return normalize_values(processed_df[column], normalization)
+
+
+def apply_overlay(processed_df, keys, overlay):
+    """Vrne rezultat z upoštevanimi ročnimi odločitvami {normalizirana vrednost: izbrana beseda}.
+
+    Odločitev velja za vse vrstice z isto normalizirano vrednostjo. Vhodni
+    DataFrame ostane nespremenjen; kopirata se samo stolpca najboljse_ujemanje
+    in za_pregled, in to le, če se katera odločitev nanaša nanj.
+    """
+    if not overlay:
+        return processed_df
+    decided = keys.map(overlay)
+    rows = decided.notna()
+    if not rows.any():
+        return processed_df
+    result = processed_df.copy(deep=False)
+    result['najboljse_ujemanje'] = processed_df['najboljse_ujemanje'].where(~rows, decided)
+    result['za_pregled'] = processed_df['za_pregled'].where(~rows, False)
+    if 'vsa_ujemanja' in processed_df.columns:
+        result['vsa_ujemanja'] = processed_df['vsa_ujemanja'].where(~rows, decided.map(lambda word: (word,)))
+    return result
+
+
+def rows_to_review(processed_df, keys, overlay=None):
+    """Vrstice, ki so označene za pregled in za njihovo vrednost še ni ročne odločitve."""
+    flagged = processed_df['za_pregled'].eq(True)
+    if overlay:
+        flagged &= ~keys.isin(list(overlay))
+    return processed_df[flagged]
+
+
+def review_groups(processed_dfs, columns, keys, overlay=None, samples=3):
+    """Vrstice za pregled iz vseh stolpcev, združene po normalizirani vrednosti.
+
+    Vrne DataFrame z indeksom vrednost in stolpci stevilo (število vrstic),
+    najboljse_ujemanje, razmerje, stolpci in primeri (prvih samples zapisov z
+    vrsticami), razvrščen po številu vrstic. Besedilo primerov se sestavi
+    samo za prvih samples vrstic vsake skupine.
+    """
+    parts = []
+    for processed_df, column, column_keys in zip(processed_dfs, columns, keys):
+        flagged = rows_to_review(processed_df, column_keys, overlay)
+        parts.append(pd.DataFrame({
+            'vrednost': column_keys[flagged.index],
+            # object, da concat ne spremeni tipa (npr. cela števila v decimalna)
+            'zapis': flagged[column].astype(object),
+            'vrstica': flagged.index + 1,
+            'stolpec': column,
+            'najboljse_ujemanje': flagged['najboljse_ujemanje'],
+            'razmerje': pd.to_numeric(flagged['razmerje'], errors='coerce'),
+        }))
+    if not parts or all(part.empty for part in parts):
+        return pd.DataFrame(
+            columns=['stevilo', 'najboljse_ujemanje', 'razmerje', 'stolpci', 'primeri'],
+            index=pd.Index([], name='vrednost'),
+        )
+    rows = pd.concat(parts, ignore_index=True)
+    grouped = rows.groupby('vrednost', sort=False)
+    # Ista normalizirana vrednost ima v vseh stolpcih isto ujemanje in razmerje
+    groups = grouped.agg(
+        stevilo=('vrednost', 'size'),
+        najboljse_ujemanje=('najboljse_ujemanje', 'first'),
+        razmerje=('razmerje', 'first'),
+    )
+
+    # Stolpcev je malo, zato gremo po stolpcih namesto po skupinah
+    names = pd.Series("", index=groups.index, dtype=object)
+    for column, part in zip(columns, parts):
+        present = groups.index.isin(part['vrednost'])
+        names = names.mask(present, (names + ", " + column).where(names.ne(""), column))
+    groups['stolpci'] = names
+
+    first = rows[grouped.cumcount().lt(samples).to_numpy()]
+    examples = first['zapis'].astype(str) + " (" + first['stolpec'] + " #" + first['vrstica'].astype(str) + ")"
+    # Po en stolpec za vsako mesto primera v skupini
+    wide = pd.DataFrame({
+        'vrednost': first['vrednost'], 'mesto': first.groupby('vrednost', sort=False).cumcount(), 'primer': examples,
+    }).pivot(index='vrednost', columns='mesto', values='primer').reindex(groups.index)
+    joined = wide[0]
+    for position in wide.columns[1:]:
+        joined = joined.where(wide[position].isna(), joined + ", " + wide[position])
+    groups['primeri'] = joined
+    return groups.sort_values('stevilo', ascending=False, kind='stable')
+
+
+def filter_review(groups, query=None, min_score=None, normalization=None):
+    """Filtrira skupine za pregled po besedilu vrednosti in po najmanjšem razmerju.
+
+    Iskalni niz se normalizira enako kot vrednosti (review_keys).
+    """
+    mask = pd.Series(True, index=groups.index)
+    if query:
+        query = normalize_text(query, normalization)
+        mask &= groups.index.to_series(index=groups.index).str.contains(query, regex=False)
+    if min_score is not None:
+        mask &= groups['razmerje'].ge(min_score)
+    return groups[mask]
+
+
+def page_count(rows, page_size):
+    """Število strani za rows vrstic (vsaj ena)."""
+    return max(1, -(-rows // page_size))
+
+
+def review_page(groups, page, page_size):
+    """Vrne skupine strani page (šteje se od 0)."""
+    page = min(max(page, 0), page_count(len(groups), page_size) - 1)
+    return groups.iloc[page * page_size:(page + 1) * page_size]
+
+
+def suggestions_above(groups, threshold):
+    """Odločitve {vrednost: predlog} za vse predloge z razmerjem nad threshold (strogo večjim)."""
+    accepted = groups['razmerje'].gt(threshold) & groups['najboljse_ujemanje'].notna()
+    return groups.loc[accepted, 'najboljse_ujemanje'].to_dict()
+
+
+def apply_rules(processed_dfs, rules):
+    """Tab 6: združi in preimenuje najboljša ujemanja ter doda identifikatorje.
+
+    rules je RuleSet. Vrne nove DataFrame-e s stolpci [stolpec,
+    najboljse_ujemanje, identifikator] ter, če so bile celice razdeljene,
+    vsa_ujemanja in identifikatorji (vsa imena in kode, ločene z vejico).
+    """
+    updated_dfs = []
+    for processed_df in processed_dfs:
+        names, identifiers = rules.apply(processed_df['najboljse_ujemanje'])
+        updated_df = processed_df.drop(columns=['za_pregled', 'razmerje'])
+        updated_df['najboljse_ujemanje'] = names
+        updated_df['identifikator'] = identifiers
+        if 'vsa_ujemanja' in processed_df.columns:
+            updated_df['vsa_ujemanja'], updated_df['identifikatorji'] = rules.apply_all(processed_df['vsa_ujemanja'])
+        updated_dfs.append(updated_df)
+    return updated_dfs
+
+
+def with_all_matches(updated_df):
+    """Doda vsa_ujemanja in identifikatorji rezultatu brez razdeljenih celic.
+
+    Brez razdeljenih celic sta enaka najboljse_ujemanje in identifikator
+    (apply_all za eno ujemanje). Rezultat z njima se vrne nespremenjen.
+    """
+    if 'vsa_ujemanja' in updated_df.columns:
+        return updated_df
+    updated_df = updated_df.copy(deep=False)
+    updated_df['vsa_ujemanja'] = updated_df['najboljse_ujemanje']
+    updated_df['identifikatorji'] = updated_df['identifikator']
+    return updated_df
+
+
+def identifier_value_labels(columns, identifiers):
+    """Oznake vrednosti za stolpce <stolpec>R: {<stolpec>R: {koda: ime}} za SPSS/Stata izvoz."""
+    labels = {}
+    for name, code in identifiers.items():
+        try:
+            labels.setdefault(int(code), name)
+        except (TypeError, ValueError):
+            continue
+    return {column + "R": labels for column in columns}
+
+
+def build_final_df(initial_df, columns, updated_dfs):
+    """Tab 7: za vsak stolpec vstavi <stolpec>_najboljse_ujemanje in <stolpec>R.
+
+    Če so bile celice razdeljene, se dodata še <stolpec>_vsa_ujemanja in
+    <stolpec>R_vse. Vrne (končni DataFrame, seznam stolpcev, ki že obstajajo
+    in niso bili dodani).
+    """
+    final_df = initial_df.copy()
+    skipped = []
+    for column_name, updated_df in zip(columns, updated_dfs):
+        new_columns = [("_najboljse_ujemanje", 'najboljse_ujemanje'), ("R", 'identifikator')]
+        if 'vsa_ujemanja' in updated_df.columns:
+            new_columns += [("_vsa_ujemanja", 'vsa_ujemanja'), ("R_vse", 'identifikatorji')]
+        position = final_df.columns.get_loc(column_name) + 1
+        for suffix, source in new_columns:
+            if column_name + suffix not in final_df.columns:
+                final_df.insert(position, column_name + suffix, updated_df[source])
+                position += 1
+            else:
+                skipped.append(column_name + suffix)
+    return final_df, skipped
+
+
+def stream_file(file, output_path, usecase, words, threshold, columns=None, mergers=None, renamers=None,
+                identifiers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, stats=None, input_columns=None, workers=-1):
+    """Obdela datoteko po kosih in rezultat sproti zapisuje v output_path.
+
+    Vrednosti, ocenjene v prejšnjih kosih, se ne ocenjujejo ponovno. Pravila
+    so privzeto iz use case-a. Če je podan input_columns, se preberejo samo ti
+    stolpci (in klasificirani). Oblika izhoda je določena s končnico
+    output_path. Vrne seznam stolpcev, ki niso bili dodani.
+
+    Vsi kosi morajo imeti iste stolpce, zato pri vklopljenem razdeljevanju
+    (separators) izhod vedno dobi <stolpec>_vsa_ujemanja in <stolpec>R_vse,
+    tudi če v nobenem kosu ni bila razdeljena nobena celica (with_all_matches).
+    """
+    fmt = file_format(file_name(file))
+    header = read_columns(file, fmt)
+    if columns is None:
+        columns = [column for column in split_names(usecase["columns"]) if column in header]
+    if not columns:
+        raise ValueError("V datoteki ni nobenega stolpca iz use case-a.")
+    if input_columns is not None:
+        input_columns = [column for column in header if column in set(input_columns) | set(columns)]
+    rules = RuleSet(
+        usecase["mergers"] if mergers is None else mergers,
+        usecase["renamers"] if renamers is None else renamers,
+        usecase["identificators"] if identifiers is None else identifiers,
+        usecase.get("normalization"),
+    )
+    if cache is None:
+        cache = MatchCache(":memory:")
+    exact_index = build_exact_index(usecase, words)
+    splitting = bool(usecase.get("separators", DEFAULT_SEPARATORS))
+
+    skipped = []
+    with TableWriter(output_path, column_types=column_types(file, fmt, input_columns)) as writer:
+        for chunk in read_table_chunks(file, fmt, chunksize, columns=input_columns):
+            processed_dfs = classify(
+                chunk, columns, words, threshold, usecase,
+                cache=cache, exact_index=exact_index, stats=stats, workers=workers,
+            )
+            updated_dfs = apply_rules(processed_dfs, rules)
+            if splitting:
+                updated_dfs = [with_all_matches(updated_df) for updated_df in updated_dfs]
+            final_chunk, skipped = build_final_df(chunk, columns, updated_dfs)
+            writer.write(final_chunk)
+    return skipped
+
+
+def run_file(input_path, output_path, usecase, words, threshold, cache_path=None, workers=-1, chunksize=None,
+             profile=False):
+    """Izvede celoten postopek za eno datoteko in vrne statistiko virov ujemanj.
+
+    Čas in pomnilnik korakov se zapišeta v dnevnik kot JSON (StageRecorder).
+    Če je profile resničen, se postopek profilira in poročilo izpiše v dnevnik.
+    """
+    recorder = StageRecorder()
+    if not profile:
+        return _process_file(input_path, output_path, usecase, words, threshold, cache_path, workers, chunksize, recorder)
+    with profiled() as report:
+        stats = _process_file(input_path, output_path, usecase, words, threshold, cache_path, workers, chunksize, recorder)
+    logging.info(f"{input_path}: profil ({report['orodje']}):\n{report['porocilo']}")
+    return stats
+
+
+def _process_file(input_path, output_path, usecase, words, threshold, cache_path, workers, chunksize, recorder):
+    stats = collections.Counter()
+    if chunksize:
+        cache = MatchCache(cache_path) if cache_path else None
+        with recorder.stage("pretocno", datoteka=input_path) as record:
+            skipped = stream_file(
+                input_path, output_path, usecase, words, threshold,
+                chunksize=chunksize, cache=cache, stats=stats, workers=workers,
+            )
+            match_record(record, stats)
+        for column in skipped:
+            logging.warning(f"Stolpec '{column}' že obstaja v končni datoteki.")
+        return dict(stats)
+
+    with recorder.stage("branje", datoteka=input_path) as record:
+        df = read_table(input_path)
+        record["vrstice"] = len(df)
+    columns = [column for column in split_names(usecase["columns"]) if column in df.columns]
+    if not columns:
+        raise ValueError(f"V datoteki '{input_path}' ni nobenega stolpca iz use case-a.")
+
+    cache = MatchCache(cache_path) if cache_path else None
+    with recorder.stage("klasifikacija", datoteka=input_path, vrstice=len(df) * len(columns)) as record:
+        processed_dfs = classify(df, columns, words, threshold, usecase, cache=cache, stats=stats, workers=workers)
+        match_record(record, stats)
+    with recorder.stage("pravila", datoteka=input_path, vrstice=len(df) * len(columns)):
+        rules = RuleSet(usecase["mergers"], usecase["renamers"], usecase["identificators"], usecase.get("normalization"))
+        updated_dfs = apply_rules(processed_dfs, rules)
+    with recorder.stage("izvoz", datoteka=input_path, vrstice=len(df)):
+        final_df, skipped = build_final_df(df, columns, updated_dfs)
+        write_table(final_df, output_path, value_labels=identifier_value_labels(columns, usecase["identificators"]))
+    for column in skipped:
+        logging.warning(f"Stolpec '{column}' že obstaja v končni datoteki.")
+    return dict(stats)
+
+
+def output_path_for(input_path, output, many, fmt=None):
+    """Izhodna pot: pri več datotekah je output mapa, sicer pot do datoteke ali mape.
+
+    V mapi dobi izhod obliko fmt ali, če ta ni podana, obliko vhodne datoteke.
+    """
+    if many or os.path.isdir(output):
+        stem, extension = os.path.splitext(os.path.basename(input_path))
+        if fmt:
+            extension = "." + fmt
+        return os.path.join(output, f"{stem}_klasificirano{extension}")
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Klasifikacija odgovorov v datotekah z anketami brez uporabniškega vmesnika.")
+    parser.add_argument("use_case", help="ime use case-a iz use_cases.yaml")
+    parser.add_argument("inputs", nargs="+", help="vhodne datoteke (CSV, Parquet, Feather, SPSS ali Stata)")
+    parser.add_argument("-o", "--output", required=True, help="izhodna datoteka ali mapa (pri več datotekah)")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help="prag podobnosti")
+    parser.add_argument("-w", "--words", help="besede za klasifikacijo, ločene z vejicami (privzeto recomenders)")
+    parser.add_argument("-c", "--config", default="use_cases.yaml", help="pot do use_cases.yaml")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="število vzporednih procesov")
+    parser.add_argument("--cache", help="pot do predpomnilnika ujemanj (SQLite)")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), help="oblika izhoda, ko je output mapa")
+    parser.add_argument("--chunksize", type=int, help="obdelaj datoteko po kosih s toliko vrsticami")
+    parser.add_argument("--profile", action="store_true", help="profiliraj obdelavo (pyinstrument ali cProfile)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(args.config)
+    if args.use_case not in config["use_cases"]:
+        parser.error(f"Use case '{args.use_case}' ne obstaja.")
+    usecase = config["use_cases"][args.use_case]
+    words = split_names(args.words if args.words else usecase["recomenders"])
+
+    many = len(args.inputs) > 1
+    output_paths = [output_path_for(input_path, args.output, many, args.format) for input_path in args.inputs]
+    # Ime izhoda je iz imena vhodne datoteke, zato enako ime iz dveh map ne sme prepisati drugega izhoda
+    by_output = collections.defaultdict(list)
+    for input_path, output_path in zip(args.inputs, output_paths):
+        by_output[os.path.normcase(os.path.abspath(output_path))].append(input_path)
+    collisions = [inputs for inputs in by_output.values() if len(inputs) > 1]
+    if collisions:
+        parser.error("Več vhodnih datotek bi zapisalo isti izhod: " + "; ".join(", ".join(inputs) for inputs in collisions))
+    if many:
+        os.makedirs(args.output, exist_ok=True)
+
+    jobs = max(1, min(args.jobs or 1, len(args.inputs)))
+    # Ko teče več datotek hkrati, vsaka uporablja eno jedro za ocenjevanje
+    workers = 1 if jobs > 1 else -1
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                run_file, input_path, output_path,
+                usecase, words, args.threshold, args.cache, workers, args.chunksize, args.profile,
+            ): input_path
+            for input_path, output_path in zip(args.inputs, output_paths)
+        }
+        for future in as_completed(futures):
+            input_path = futures[future]
+            try:
+                stats = future.result()
+                logging.info(f"{input_path}: {stats}")
+            except Exception as e:
+                failed += 1
+                logging.error(f"{input_path}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import functools
+import types
+
+import numpy as np
+import pandas as pd
+
+from normalization import normalization_options, normalize_text
+
+
+# Ločilo med več imeni ali kodami v eni celici izvoza
+MULTI_VALUE_SEPARATOR = ", "
+
+
+def normalize_key(value, options=None):
+    """Normalizira besedo za iskanje v slovarjih (normalize_text z možnostmi options)."""
+    return normalize_text(value, options)
+
+
+def build_exact_index(usecase, words):
+    """Zgradi indeks za točna ujemanja: normalizirana vrednost -> beseda.
+
+    Vsebuje besede za klasifikacijo ter ključe iz mergers, renamers in
+    identificators. Če se ključ pojavi večkrat, ima prednost seznam besed,
+    nato mergers, renamers in identificators. Ključi so normalizirani z
+    možnostmi use case-a (normalization), enako kot vrednosti iz podatkov.
+    Indeks je samo za branje, da ga lahko delijo seje in niti.
+    """
+    options = usecase.get("normalization")
+    index = {}
+    sources = [words, usecase.get("mergers", {}), usecase.get("renamers", {}), usecase.get("identificators", {})]
+    for source in sources:
+        for word in source:
+            if not isinstance(word, str) or not word.strip():
+                continue
+            index.setdefault(normalize_key(word, options), word)
+    return types.MappingProxyType(index)
+
+
+def _rule_edges(mergers, renamers, options=None):
+    """Združi mergers in renamers v povezave {normaliziran ključ: cilj} in vrne (povezave, konflikti).
+
+    Ključi in cilji se normalizirajo z možnostmi options (normalization use case-a).
+
+    Konflikt je ključ, ki ima v obeh slovarjih (ali dvakrat po normalizaciji)
+    različna cilja. Prazni ključi in cilji (npr. prazne vrstice urejevalnika)
+    se preskočijo.
+    """
+    edges = {}
+    conflicts = []
+    loops = {}
+    for source in (mergers, renamers):
+        for key, target in source.items():
+            if not isinstance(key, str) or not key.strip() or not isinstance(target, str) or not target.strip():
+                continue
+            key = normalize_key(key, options)
+            if key == normalize_key(target, options):
+                # Povezava sama nase (npr. "hot": "hot") ne nasprotuje drugim pravilom
+                loops.setdefault(key, target.strip())
+            elif key in edges and normalize_key(edges[key], options) != normalize_key(target, options):
+                conflicts.append(f"Konflikt v pravilih: '{key}' → '{edges[key]}' in '{target}'.")
+            else:
+                edges.setdefault(key, target.strip())
+    for key, target in loops.items():
+        edges.setdefault(key, target)
+    return edges, conflicts
+
+
+def _resolve(key, edges, options=None):
+    """Sledi povezavam od key do končnega cilja; vrne (cilj, pot ali None, če ni cikla)."""
+    path = [key]
+    target = edges[key]
+    # Povezava sama nase ni cikel, ampak konec verige
+    while normalize_key(target, options) in edges and normalize_key(target, options) != path[-1]:
+        next_key = normalize_key(target, options)
+        if next_key in path:
+            return None, path[path.index(next_key):] + [next_key]
+        path.append(next_key)
+        target = edges[next_key]
+    return target, None
+
+
+def rule_problems(mergers, renamers, options=None):
+    """Vrne seznam opisov konfliktov in ciklov v pravilih; prazen seznam pomeni veljavna pravila.
+
+    options so možnosti normalizacije use case-a, enake kot pri ujemanju.
+    """
+    edges, problems = _rule_edges(mergers, renamers, options)
+    cycles = set()
+    for key in edges:
+        _, cycle = _resolve(key, edges, options)
+        if cycle is not None:
+            # Isti cikel najdemo iz vsakega njegovega ključa; zapišemo ga enkrat
+            start = cycle.index(min(cycle[:-1]))
+            cycles.add(tuple(cycle[start:-1] + cycle[:start + 1]))
+    problems += [f"Cikel v pravilih: {' → '.join(cycle)}." for cycle in sorted(cycles)]
+    return problems
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(merger_items, renamer_items, options):
+    mergers, renamers = dict(merger_items), dict(renamer_items)
+    problems = rule_problems(mergers, renamers, options)
+    if problems:
+        raise ValueError(" ".join(problems))
+    edges, _ = _rule_edges(mergers, renamers, options)
+    return types.MappingProxyType({key: _resolve(key, edges, options)[0] for key in edges})
+
+
+def compile_rules(mergers, renamers, options=None):
+    """Združi mergers in renamers v eno tabelo {normaliziran ključ: končni cilj}.
+
+    Verige (npr. "hofer telekom" → "hofer" → "hot") se razrešijo do konca, zato
+    je uporaba pravil eno iskanje na vrednost. Ob konfliktih ali ciklih sproži
+    ValueError. Ključi so normalizirani z možnostmi options (normalization
+    use case-a), enako kot vrednosti pri ujemanju. Rezultat je predpomnjen
+    glede na vsebino pravil in možnosti ter ga ni mogoče spreminjati.
+    """
+    return _compile(tuple(mergers.items()), tuple(renamers.items()), normalization_options(options))
+
+
+class RuleSet:
+    """Pravila iz tab 5, pripravljena za uporabo na celih stolpcih.
+
+    Ime se razreši s prevedeno tabelo iz compile_rules (združevanje in
+    preimenovanje v enem koraku), identifikator pa se določi iz končnega
+    imena; neznana imena dobijo največji identifikator. Vsako različno
+    ujemanje se razreši enkrat in se prek kod iz pd.factorize preslika na
+    vse vrstice. Imena se normalizirajo z možnostmi options (normalization
+    use case-a). Po izdelavi se ne spreminja, zato ga lahko hkrati uporablja
+    več sej (app.get_rule_set).
+    """
+
+    def __init__(self, mergers, renamers, identifiers, options=None):
+        self.options = normalization_options(options)
+        self.lookup = compile_rules(mergers, renamers, self.options)
+        self.identifiers = types.MappingProxyType(
+            {normalize_key(name, self.options): code for name, code in identifiers.items() if isinstance(name, str)}
+        )
+        # Kot niz, da ima stolpec identifikator en sam tip (potrebno za Parquet/Feather)
+        self.default_identifier = str(max(int(value) for value in identifiers.values()))
+
+    def resolve(self, name):
+        """Končno ime za najboljše ujemanje name."""
+        return self.lookup.get(normalize_key(name, self.options), name)
+
+    def apply(self, matches):
+        """Vrne (razrešena ujemanja, identifikatorji) kot seriji z indeksom matches.
+
+        Manjkajoča ujemanja (None, NaN) ostanejo prazna v obeh serijah.
+        """
+        codes, uniques = pd.factorize(matches)
+        resolved = [self.resolve(name) for name in uniques]
+        # Zadnji element je None, zato koda -1 (manjkajoče) vrne None
+        names = np.array(resolved + [None], dtype=object)
+        identifiers = np.array(
+            [self.identifiers.get(normalize_key(name, self.options), self.default_identifier) for name in resolved] + [None],
+            dtype=object,
+        )
+        return (
+            pd.Series(names[codes], index=matches.index, dtype=object),
+            pd.Series(identifiers[codes], index=matches.index, dtype=object),
+        )
+
+    def apply_all(self, all_matches):
+        """Kot apply, za stolpec vsa_ujemanja (tuple ujemanj na vrstico).
+
+        Vrne imena in kode kot niza, ločena z MULTI_VALUE_SEPARATOR; ponovljena
+        imena in kode se izpustijo.
+        """
+        codes, uniques = pd.factorize(all_matches)
+        names, identifiers = [], []
+        for matches in uniques:
+            resolved = list(dict.fromkeys(self.resolve(name) for name in matches))
+            names.append(MULTI_VALUE_SEPARATOR.join(resolved))
+            identifiers.append(MULTI_VALUE_SEPARATOR.join(dict.fromkeys(
+                self.identifiers.get(normalize_key(name, self.options), self.default_identifier) for name in resolved
+            )))
+        names = np.array(names + [None], dtype=object)
+        identifiers = np.array(identifiers + [None], dtype=object)
+        return (
+            pd.Series(names[codes], index=all_matches.index, dtype=object),
+            pd.Series(identifiers[codes], index=all_matches.index, dtype=object),
+        )
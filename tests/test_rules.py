@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rules import RuleSet, compile_rules, rule_problems  # noqa: E402
+
+
+IDENTIFIERS = {"telekom": "1", "hot": "2", "tuš": "3", "neznano": "99"}
+
+
+def test_rule_set_uses_default_normalization():
+    rules = RuleSet({"Telekom Slovenije": "telekom"}, {}, IDENTIFIERS)
+    names, identifiers = rules.apply(pd.Series(["telekom slovenije", "tus", None]))
+    assert names.tolist() == ["telekom", "tus", None]
+    assert identifiers.tolist() == ["1", "99", None]
+
+
+def test_rule_set_uses_usecase_normalization():
+    options = {"strip_diacritics": True, "strip_punctuation": True}
+    rules = RuleSet({"Tuš mobil!": "tuš"}, {}, IDENTIFIERS, options)
+    names, identifiers = rules.apply(pd.Series(["tus mobil", "TUS", "hot"]))
+    assert names.tolist() == ["tuš", "TUS", "hot"]
+    assert identifiers.tolist() == ["3", "3", "2"]
+
+
+def test_case_sensitive_rules_without_casefold():
+    options = {"casefold": False}
+    rules = RuleSet({"HOT": "hot"}, {}, IDENTIFIERS, options)
+    assert rules.resolve("HOT") == "hot"
+    assert rules.resolve("Hot") == "Hot"
+    assert compile_rules({"HOT": "hot"}, {}, options) == {"HOT": "hot"}
+
+
+def test_rule_problems_follow_normalization():
+    mergers = {"čaj": "telekom", "caj": "hot"}
+    assert rule_problems(mergers, {}) == []
+    assert len(rule_problems(mergers, {}, {"strip_diacritics": True})) == 1
@@ -0,0 +1,83 @@
+import hashlib
+
+import streamlit as st
+
+from datafiles import detect_delimiter, file_format, in_file_order, read_columns, read_table, unique_values
+from instrumentation import StageRecorder
+
+
+# Največ toliko shranjenih rezultatov na funkcijo; najdlje neuporabljeni se zavržejo
+INFO_ENTRIES = 16
+TABLE_ENTRIES = 4
+COLUMN_ENTRIES = 128
+
+
+def upload_fingerprint(uploaded_file):
+    """Zgoščena vrednost vsebine naložene datoteke; izračuna se enkrat na nalaganje.
+
+    Ključ je file_id iz st.file_uploader, ki se ob vsakem novem nalaganju
+    spremeni, zato se vsebina ne zgošča ob vsakem ponovnem zagonu skripte.
+    """
+    fingerprints = st.session_state.setdefault('upload_fingerprints', {})
+    file_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+    if file_id not in fingerprints:
+        fingerprints[file_id] = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+    return fingerprints[file_id]
+
+
+@st.cache_data(max_entries=INFO_ENTRIES, show_spinner=False)
+def upload_info(fingerprint, _uploaded_file, name):
+    """Oblika, ločilo in imena stolpcev naložene datoteke (po zgoščeni vrednosti)."""
+    fmt = file_format(name)
+    delimiter = detect_delimiter(_uploaded_file) if fmt == "csv" else None
+    return {"format": fmt, "delimiter": delimiter, "columns": read_columns(_uploaded_file, fmt, delimiter)}
+
+
+@st.cache_resource(max_entries=TABLE_ENTRIES, show_spinner=False)
+def upload_table(fingerprint, _uploaded_file, fmt, delimiter, columns, _recorder=None):
+    """Izbrani stolpci prebrane datoteke (columns je tuple v vrstnem redu datoteke), skupni vsem sejam.
+
+    Dekodirajo se samo stolpci columns (read_table). cache_resource namesto
+    cache_data, da se DataFrame ob vsakem ponovnem zagonu ne kopira. Korak
+    branje se zapiše v _recorder (brez njega samo v dnevnik) le ob dejanskem
+    branju, ne ob zadetku v predpomnilniku.
+    """
+    with (_recorder or StageRecorder()).stage("branje", datoteka=_uploaded_file.name, stolpci=", ".join(columns)) as record:
+        table = read_table(_uploaded_file, fmt, columns=list(columns), delimiter=delimiter)
+        record["vrstice"] = len(table)
+    return table
+
+
+@st.cache_data(max_entries=COLUMN_ENTRIES, show_spinner=False)
+def upload_uniques(fingerprint, _uploaded_file, fmt, delimiter, columns, streamed=False, _table=None, _recorder=None):
+    """Unikatne neprazne vrednosti stolpcev columns (tuple) brez presledkov na robovih.
+
+    Vsi stolpci se zberejo v enem prehodu: pri pretočni obdelavi (streamed)
+    po kosih datoteke, ki se zapiše kot korak branje v _recorder, sicer iz
+    _table, že prebranih stolpcev (read_upload).
+    """
+    if streamed:
+        with (_recorder or StageRecorder()).stage("branje", datoteka=_uploaded_file.name, pretocno=True):
+            return unique_values(_uploaded_file, list(columns), fmt, delimiter=delimiter)
+    values = set()
+    for column in columns:
+        values.update(str(value).strip() for value in _table[column].dropna().unique())
+    values.discard("")
+    return values
+
+
+def upload_columns(info, columns):
+    """Izbrani stolpci kot tuple v vrstnem redu datoteke; ključ za upload_table in upload_uniques."""
+    return tuple(in_file_order(columns, info["columns"]))
+
+
+def read_upload(uploaded_file, info, columns, recorder=None):
+    """Izbrani stolpci naložene datoteke v vrstnem redu datoteke.
+
+    DataFrame je skupen vsem sejam (upload_table), zato se ne sme spreminjati;
+    classify in build_final_df ga samo berejo. Branje se zapiše v recorder.
+    """
+    return upload_table(
+        upload_fingerprint(uploaded_file), uploaded_file, info["format"], info["delimiter"], upload_columns(info, columns),
+        _recorder=recorder,
+    )